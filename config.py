@@ -24,6 +24,7 @@ class Config:
     MZ_TOLERANCE: float = 0.7
     RT_TOLERANCE: float = 2.0  # 2 minutes tolerance (RT converted to minutes)
     MSMS_TOLERANCE: float = 0.7
+    MSMS_CACHE_SIZE: int = 65536  # Max number of parsed MS/MS spectra kept by the QE calculator
     PRECURSOR_MZ_MIN_DIFF: float = 14.0126
     ION_PAIR_MIN_DIFF: float = 2.0
     MAX_IONS_PER_CE: int = 10
@@ -32,6 +33,18 @@ class Config:
     # Batch processing parameters
     BATCH_SIZE: int = 50  # Number of compounds processed per batch
     SAVE_INTERVAL: int = 100  # Save intermediate results after processing this many compounds
+    # Number of forked worker processes for compounds and index building, 1 processes everything in the
+    # main process, 0 means use all CPU cores. Each worker keeps its own in-memory caches (parsed
+    # MS/MS spectra and interference windows), so memory grows roughly linearly with the number of workers
+    N_WORKERS: int = 1
+    USE_DATA_CACHE: bool = True  # Convert TQDB CSV files to a binary chunk cache in ./.data_cache on first read (about as large as the CSV files)
+    INTERFERENCE_CACHE_SIZE: int = 256  # Number of interference window query results kept in memory when INTERFERENCE_CACHE_GRID is set
+    INTERFERENCE_CACHE_MB: float = 128.0  # Memory budget of the interference window cache per process
+    INTERFERENCE_CACHE_GRID: float = 0.0  # Round query m/z and RT to this grid so nearby compounds share cached results, 0 queries exact windows without caching
+    # Budget for resident memory (RSS, including the Python interpreter and loaded libraries, not only
+    # Python objects). The main process clears its caches when its own RSS exceeds 80% of it; the
+    # reported usage adds the worker processes, counting pages shared with forked workers once per process
+    MEMORY_LIMIT_GB: float = 2.0
     
     # Scoring parameters
     SENSITIVITY_WEIGHT: float = 0.5
@@ -10,12 +10,27 @@ import pandas as pd
 import numpy as np
 from tqdm import tqdm
 import gc
-import pickle
+import re
+import shutil
 import hashlib
+import json
 import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ranges import WINDOW_MARGIN
 
 logger = logging.getLogger(__name__)
 
+# Bumped whenever InChIKey normalization changes, so persisted indexes are rebuilt
+_INDEX_FORMAT_VERSION = 1
+
+# Low-cardinality interference columns compared against scalars for every compound
+_CATEGORY_COLUMNS = ('Ion_mode', 'Precursor_type')
+
+# Separator joining the values of a string column into one UTF-8 blob in the binary chunk cache
+_TEXT_SEPARATOR = '\x00'
+
 
 class DataLoader:
     """Data loader with optimized memory usage"""
@@ -23,11 +38,14 @@ class DataLoader:
     def __init__(self, config):
         self.config = config
         
-    def load_demo_data(self) -> pd.DataFrame:
-        """Load demo data"""
+    def load_demo_data(self, usecols: Optional[List[str]] = None) -> pd.DataFrame:
+        """Load demo data (optionally only the given columns, all read as strings)"""
         logger.info("Reading demo_data.csv...")
         try:
-            df = pd.read_csv(self.config.DEMO_DATA_PATH, low_memory=False, encoding='ISO-8859-1')
+            if usecols is not None:
+                df = pd.read_csv(self.config.DEMO_DATA_PATH, usecols=usecols, dtype=str, encoding='ISO-8859-1')
+            else:
+                df = pd.read_csv(self.config.DEMO_DATA_PATH, low_memory=False, encoding='ISO-8859-1')
             logger.info(f"demo_data.csv contains {len(df)} rows of data")
             return df
         except Exception as e:
@@ -40,21 +58,12 @@ class DataLoader:
         
         # Check if it's a file or folder
         if os.path.isfile(folder_path):
-            # If it's a file, use original method
-            chunks = []
+            # If it's a file, parse it in one pass so the parser builds the final
+            # columns directly instead of concatenating a copy of all chunks
             try:
-                for chunk in tqdm(
-                    pd.read_csv(folder_path, chunksize=self.config.CHUNK_SIZE, encoding='utf-8'), 
-                    desc=f"Reading {desc}"
-                ):
-                    chunks.append(chunk)
-                    
-                df = pd.concat(chunks, ignore_index=True)
+                df = pd.read_csv(folder_path, encoding='utf-8', low_memory=False)
                 logger.info(f"{desc} contains {len(df)} rows of data")
                 
-                del chunks
-                gc.collect()
-                
                 return df
             except Exception as e:
                 logger.error(f"Failed to read {desc}: {e}")
@@ -73,27 +82,302 @@ class DataLoader:
             
             logger.info(f"Found {len(csv_files)} CSV files in {folder_path}")
             
-            all_chunks = []
+            # Queue reads of all files up front so disk I/O overlaps with parsing
+            _prefetch_files([os.path.join(folder_path, csv_file) for csv_file in csv_files])
+            
+            # One frame per file (not per chunk), concatenated once at the end
+            file_frames = []
             
             try:
                 for csv_file in tqdm(csv_files, desc=f"Reading {desc} files"):
                     file_path = os.path.join(folder_path, csv_file)
-                    for chunk in pd.read_csv(file_path, chunksize=self.config.CHUNK_SIZE, encoding='utf-8'):
-                        all_chunks.append(chunk)
-                        
-                df = pd.concat(all_chunks, ignore_index=True)
-                logger.info(f"{desc} contains {len(df)} rows of data (from {len(csv_files)} files)")
+                    file_frames.append(pd.read_csv(file_path, encoding='utf-8', low_memory=False))
+                
+                df = pd.concat(file_frames, ignore_index=True)
                 
                 # Clean up memory
-                del all_chunks
+                del file_frames
                 gc.collect()
                 
+                logger.info(f"{desc} contains {len(df)} rows of data (from {len(csv_files)} files)")
+                
                 return df
             except Exception as e:
                 logger.error(f"Failed to read {desc} from folder {folder_path}: {e}")
                 raise
 
 
+def _prefetch_files(file_paths: list):
+    """Ask the OS to start reading files into the page cache in the background (Linux only)"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for file_path in file_paths:
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.debug(f"Prefetch skipped for {file_path}: {e}")
+
+
+def _short_hash(text: str) -> str:
+    """Get a 16 hex digit non-cryptographic digest used for cache file names and signatures"""
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def _save_chunk(path: str, chunk: pd.DataFrame):
+    """
+    Save a parsed CSV chunk as a pickle-free binary file, raising ValueError for unsupported columns
+    
+    Layout: 8-byte header length, JSON header (columns, dtypes, buffer offsets), then raw column
+    buffers, each padded to 8 bytes. String columns are one separator-joined UTF-8 blob plus a
+    missing-value mask.
+    """
+    if not (isinstance(chunk.index, pd.RangeIndex) and chunk.index.step == 1):
+        raise ValueError("chunk index is not a contiguous range")
+    header = {
+        'n_rows': len(chunk),
+        'index_start': int(chunk.index[0]) if len(chunk) > 0 else 0,
+        'columns': [],
+    }
+    buffers = []
+    offset = 0
+    
+    def add_buffer(data: bytes) -> List[int]:
+        nonlocal offset
+        location = [offset, len(data)]
+        padding = -len(data) % 8
+        buffers.append(data + b'\0' * padding)
+        offset += len(data) + padding
+        return location
+    
+    for i, col in enumerate(chunk.columns):
+        values = chunk.iloc[:, i]
+        if values.dtype == object or isinstance(values.dtype, pd.StringDtype):
+            nulls = values.isna().to_numpy()
+            strings = values.where(~nulls, '')
+            if pd.api.types.infer_dtype(strings, skipna=True) not in ('string', 'empty'):
+                raise ValueError(f"column {col!r} holds non-string values")
+            text = _TEXT_SEPARATOR.join(strings.tolist())
+            if len(values) > 0 and text.count(_TEXT_SEPARATOR) != len(values) - 1:
+                raise ValueError(f"column {col!r} contains the cache separator character")
+            header['columns'].append({
+                'name': col, 'dtype': str(values.dtype),
+                'text': add_buffer(text.encode('utf-8')), 'nulls': add_buffer(nulls.tobytes()),
+            })
+        elif values.dtype.kind in 'biuf':
+            array = np.ascontiguousarray(values.to_numpy())
+            header['columns'].append({'name': col, 'dtype': array.dtype.str, 'values': add_buffer(array.tobytes())})
+        else:
+            raise ValueError(f"column {col!r} has unsupported dtype {values.dtype}")
+    
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+    with open(path, 'wb') as f:
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        for buffer in buffers:
+            f.write(buffer)
+
+
+def _load_chunk(path: str) -> pd.DataFrame:
+    """Load a chunk saved by _save_chunk"""
+    with open(path, 'rb') as f:
+        raw = bytearray(f.read())
+    header_length = int.from_bytes(raw[:8], 'little')
+    header = json.loads(raw[8:8 + header_length])
+    base = 8 + header_length
+    n_rows = header['n_rows']
+    
+    values_by_position = {}
+    for i, col in enumerate(header['columns']):
+        if 'text' in col:
+            text_offset, text_length = col['text']
+            values = np.empty(n_rows, dtype=object)
+            if n_rows > 0:
+                values[:] = raw[base + text_offset:base + text_offset + text_length].decode('utf-8').split(_TEXT_SEPARATOR)
+            values[np.frombuffer(raw, dtype=bool, count=n_rows, offset=base + col['nulls'][0])] = np.nan
+            # Explicit dtype, so object columns are not inferred as strings (pandas >= 3) and vice versa
+            values = pd.Series(values, dtype=col['dtype'], copy=False)
+        else:
+            values = np.frombuffer(raw, dtype=np.dtype(col['dtype']), count=n_rows, offset=base + col['values'][0])
+        values_by_position[i] = values
+    
+    chunk = pd.DataFrame(values_by_position)
+    chunk.columns = [col['name'] for col in header['columns']]
+    chunk.index = pd.RangeIndex(header['index_start'], header['index_start'] + n_rows)
+    return chunk
+
+
+def _save_chunk_stats(path: str, chunk_stats: List[Dict[str, Tuple[float, float]]]):
+    """Save per-chunk numeric column (min, max) statistics as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(chunk_stats, f)
+
+
+def _load_chunk_stats(path: str) -> List[Dict[str, Tuple[float, float]]]:
+    """Load statistics saved by _save_chunk_stats"""
+    with open(path, encoding='utf-8') as f:
+        return [{col: tuple(bounds) for col, bounds in stats.items()} for stats in json.load(f)]
+
+
+def _interference_columns(use_avg_mz: bool) -> Tuple[str, str]:
+    """Select m/z and RT columns for the database format"""
+    if use_avg_mz:
+        return 'Average Mz', 'Average Rt(min)'
+    return 'PrecursorMZ', 'RT'
+
+
+def _window_mask(df: pd.DataFrame, mz_col: str, rt_col: str, precursormz: float, rt: float,
+                 mz_tolerance: float, rt_tolerance: float) -> np.ndarray:
+    """Build the m/z and RT window mask on raw NumPy arrays, reusing one scratch buffer"""
+    mz_values = df[mz_col].to_numpy(dtype=np.float64)
+    rt_values = df[rt_col].to_numpy(dtype=np.float64)
+    diff = np.subtract(mz_values, precursormz)
+    mask = np.abs(diff, out=diff) <= mz_tolerance
+    np.subtract(rt_values, rt, out=diff)
+    mask &= np.abs(diff, out=diff) <= rt_tolerance
+    return mask
+
+
+def _chunk_may_match(chunk_stats: Dict[str, Tuple[float, float]],
+                     value_ranges: Dict[str, Tuple[float, float]]) -> bool:
+    """Check whether a chunk's column min/max can overlap all requested value ranges"""
+    for col, (low, high) in value_ranges.items():
+        if col in chunk_stats:
+            col_min, col_max = chunk_stats[col]
+            # All-NaN columns have NaN statistics and never match
+            if not (col_min <= high and col_max >= low):
+                return False
+    return True
+
+
+def _inchikey_match_key(inchikey: str) -> str:
+    """Get whitespace-free, lowercase form shared by all spellings that match an InChIKey"""
+    return re.sub(r'\s+', '', inchikey).lower()
+
+
+def _index_one_file(file_path: str) -> Tuple[set, set]:
+    """Collect all InChIKeys (original and whitespace-cleaned) and raw InChIKey values found in one CSV file"""
+    file_keys = set()
+    raw_values = set()
+    csv_file = os.path.basename(file_path)
+    
+    # Read file in chunks and index InChIKeys
+    try:
+        chunk_count = 0
+        # Only the InChIKey column is needed, skip parsing all other columns
+        for chunk in pd.read_csv(file_path, chunksize=50000, encoding='utf-8', memory_map=True,
+                                 usecols=lambda col: col == 'InChIKey', dtype=str):
+            chunk_count += 1
+            if 'InChIKey' in chunk.columns:
+                # Normalize the whole column at once and drop placeholder values
+                raw_inchikeys = chunk['InChIKey'].dropna().astype(str)
+                inchikeys = raw_inchikeys.str.strip()
+                valid = ~inchikeys.str.lower().isin(['nan', 'none', ''])
+                inchikeys = inchikeys[valid]
+                # Keep raw spellings so queries can match rows without normalizing them
+                raw_values.update(pd.unique(raw_inchikeys[valid]))
+                # Index original keys, plus cleaned (whitespace removed) versions where they differ
+                # Same (Unicode-aware) whitespace pattern as _inchikey_match_key
+                inchikeys_clean = inchikeys.str.replace(r'\s+', '', regex=True)
+                file_keys.update(pd.unique(inchikeys))
+                file_keys.update(pd.unique(inchikeys_clean[inchikeys_clean != inchikeys]))
+            # Log progress for large files
+            if chunk_count % 100 == 0:
+                logger.debug(f"  Indexed {chunk_count} chunks from {csv_file}")
+    except Exception as e:
+        logger.warning(f"Error indexing {csv_file}: {e}")
+    
+    return file_keys, raw_values
+
+
+class InChIKeyIndex:
+    """Compact InChIKey -> file_paths index backed by sorted NumPy arrays"""
+    
+    def __init__(self, keys: np.ndarray, file_ids: np.ndarray, file_paths: list,
+                 raw_match_keys: np.ndarray, raw_values: np.ndarray, signature: str = ""):
+        # keys is sorted; keys[i] occurs in file_paths[file_ids[i]]
+        self.keys_sorted = keys
+        self.file_ids = file_ids
+        self.file_paths = list(file_paths)
+        # raw_match_keys is sorted; raw_values[i] is a raw spelling with match key raw_match_keys[i]
+        self.raw_match_keys = raw_match_keys
+        self.raw_values = raw_values
+        self.signature = signature
+        if len(keys) > 0:
+            self.unique_keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        else:
+            self.unique_keys = keys
+    
+    @classmethod
+    def from_file_keys(cls, file_paths: list, keys_per_file: list, raw_values: set,
+                       signature: str = "") -> 'InChIKeyIndex':
+        """Create index from per-file sets of InChIKeys and the set of raw InChIKey values"""
+        all_keys = [key for file_keys in keys_per_file for key in file_keys]
+        keys = np.array(all_keys, dtype=str) if all_keys else np.array([], dtype='<U1')
+        file_ids = np.repeat(
+            np.arange(len(file_paths), dtype=np.int32),
+            [len(file_keys) for file_keys in keys_per_file]
+        )
+        order = np.argsort(keys, kind='stable')
+        
+        raw_values = np.array(sorted(raw_values), dtype=str) if raw_values else np.array([], dtype='<U1')
+        raw_match_keys = pd.Series(raw_values, dtype=object).str.replace(r'\s+', '', regex=True).str.lower()
+        raw_match_keys = raw_match_keys.to_numpy().astype(str) if len(raw_values) else raw_values
+        raw_order = np.argsort(raw_match_keys, kind='stable')
+        return cls(keys[order], file_ids[order], file_paths,
+                   raw_match_keys[raw_order], raw_values[raw_order], signature)
+    
+    @classmethod
+    def load(cls, index_path: str) -> 'InChIKeyIndex':
+        """Load index from .npz file"""
+        with np.load(index_path, allow_pickle=False) as data:
+            return cls(data['keys'], data['file_ids'], data['file_paths'].tolist(),
+                       data['raw_match_keys'], data['raw_values'], str(data['signature']))
+    
+    def save(self, index_path: str):
+        """Save index to .npz file"""
+        np.savez(
+            index_path, keys=self.keys_sorted, file_ids=self.file_ids,
+            file_paths=np.array(self.file_paths, dtype=str), raw_match_keys=self.raw_match_keys,
+            raw_values=self.raw_values, signature=np.array(self.signature)
+        )
+    
+    def _locate(self, inchikey: str) -> Tuple[int, int]:
+        """Get [start, end) range of inchikey in sorted keys"""
+        start = np.searchsorted(self.keys_sorted, inchikey, side='left')
+        end = np.searchsorted(self.keys_sorted, inchikey, side='right')
+        return int(start), int(end)
+    
+    def __contains__(self, inchikey) -> bool:
+        start, end = self._locate(str(inchikey))
+        return end > start
+    
+    def __getitem__(self, inchikey: str) -> list:
+        start, end = self._locate(str(inchikey))
+        if end == start:
+            raise KeyError(inchikey)
+        return [self.file_paths[file_id] for file_id in self.file_ids[start:end]]
+    
+    def __len__(self) -> int:
+        return len(self.unique_keys)
+    
+    def raw_spellings(self, inchikey: str) -> list:
+        """Get raw InChIKey values that have the same match key as inchikey"""
+        match_key = _inchikey_match_key(inchikey)
+        start = np.searchsorted(self.raw_match_keys, match_key, side='left')
+        end = np.searchsorted(self.raw_match_keys, match_key, side='right')
+        return self.raw_values[start:end].tolist()
+    
+    def keys(self) -> list:
+        """Get unique InChIKeys"""
+        return self.unique_keys.tolist()
+
+
 class LazyFileLoader:
     """Lazy file loader that queries data on-demand without loading everything into memory"""
     
@@ -101,176 +385,302 @@ class LazyFileLoader:
         self.config = config
         self.index_cache_dir = '.index_cache'
         os.makedirs(self.index_cache_dir, exist_ok=True)
+        self.data_cache_dir = '.data_cache'
+        if self.config.USE_DATA_CACHE:
+            os.makedirs(self.data_cache_dir, exist_ok=True)
         self.file_indexes = {}  # Cache file indexes
+        self.range_stats = {}  # Cache per-file m/z and RT ranges
     
     def _get_index_path(self, source_path: str) -> str:
         """Get index file path"""
-        path_hash = hashlib.md5(source_path.encode()).hexdigest()[:16]
-        index_name = f"index_{os.path.basename(source_path)}_{path_hash}.pkl"
+        path_hash = _short_hash(source_path)
+        index_name = f"index_{os.path.basename(source_path)}_{path_hash}.npz"
         return os.path.join(self.index_cache_dir, index_name)
     
-    def _build_file_index(self, folder_path: str, desc: str) -> dict:
+    def _get_data_cache_prefix(self, file_path: str) -> str:
+        """Get the name prefix shared by all binary chunk cache folders of a CSV file"""
+        return f"{os.path.basename(file_path)}_{_short_hash(os.path.abspath(file_path))}_"
+    
+    def _get_data_cache_path(self, file_path: str) -> str:
+        """Get binary chunk cache folder for a CSV file (changes when the file changes)"""
+        stat = os.stat(file_path)
+        version_hash = _short_hash(f"{stat.st_size}:{stat.st_mtime_ns}")
+        return os.path.join(self.data_cache_dir, f"{self._get_data_cache_prefix(file_path)}{version_hash}")
+    
+    def _remove_stale_data_caches(self, file_path: str, cache_path: str):
+        """Delete cache folders of earlier versions of a CSV file"""
+        pattern = re.compile(re.escape(self._get_data_cache_prefix(file_path)) + r'[0-9a-f]{16}')
+        for name in os.listdir(self.data_cache_dir):
+            stale_path = os.path.join(self.data_cache_dir, name)
+            if pattern.fullmatch(name) and stale_path != cache_path:
+                logger.debug(f"Removing stale data cache {stale_path}")
+                shutil.rmtree(stale_path, ignore_errors=True)
+    
+    def _iter_csv_chunks(self, file_path: str,
+                         value_ranges: Optional[Dict[str, Tuple[float, float]]] = None) -> Iterator[pd.DataFrame]:
+        """Iterate over parsed chunks of a CSV file, converting it to a binary chunk cache on first read
+        
+        The cache holds pickle-free binary files, so loading it never executes code from the cache folder.
+        With value_ranges ({column: (low, high)}), cached chunks whose min/max statistics show
+        no value of a column inside its range are skipped without being loaded. Chunks that are
+        not skipped may still contain rows outside the ranges.
+        """
+        if not self.config.USE_DATA_CACHE:
+            yield from pd.read_csv(file_path, chunksize=50000, encoding='utf-8', low_memory=False,
+                                   memory_map=True)
+            return
+        
+        cache_path = self._get_data_cache_path(file_path)
+        if os.path.isdir(cache_path):
+            # Cached chunks are already parsed, no CSV tokenizing or type inference needed
+            chunk_files = sorted(f for f in os.listdir(cache_path) if f.startswith('chunk_'))
+            chunk_stats = None
+            stats_path = os.path.join(cache_path, 'stats.json')
+            if value_ranges and os.path.exists(stats_path):
+                chunk_stats = _load_chunk_stats(stats_path)
+                if len(chunk_stats) != len(chunk_files):
+                    chunk_stats = None
+            for i, chunk_file in enumerate(chunk_files):
+                if chunk_stats is not None and not _chunk_may_match(chunk_stats[i], value_ranges):
+                    continue
+                yield _load_chunk(os.path.join(cache_path, chunk_file))
+            return
+        
+        # First read: parse CSV and store each chunk, publish the cache only when complete
+        logger.info(f"Caching parsed chunks of {os.path.basename(file_path)} in {self.data_cache_dir}")
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        try:
+            # Parse straight from a memory-mapped file instead of buffered reads
+            chunk_stats = []
+            cacheable = True
+            for i, chunk in enumerate(pd.read_csv(file_path, chunksize=50000, encoding='utf-8', low_memory=False,
+                                                  memory_map=True)):
+                if cacheable:
+                    try:
+                        _save_chunk(os.path.join(tmp_path, f"chunk_{i:06d}.bin"), chunk)
+                    except ValueError as e:
+                        logger.warning(f"Not caching {os.path.basename(file_path)}: {e}")
+                        cacheable = False
+                    # Min/max of numeric columns, used to skip chunks in range queries
+                    numeric = chunk.select_dtypes(include='number')
+                    chunk_stats.append(dict(zip(numeric.columns, zip(numeric.min().tolist(), numeric.max().tolist()))))
+                yield chunk
+            if not cacheable:
+                return
+            _save_chunk_stats(os.path.join(tmp_path, 'stats.json'), chunk_stats)
+            try:
+                os.rename(tmp_path, cache_path)
+            except OSError:
+                # Another process published the same cache first
+                return
+            self._remove_stale_data_caches(file_path, cache_path)
+        finally:
+            # Unpublished after errors, unfinished or abandoned (generator closed early) conversions
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    
+    @staticmethod
+    def _get_folder_signature(folder_path: str) -> str:
+        """Get signature of the CSV files in a folder (names, sizes and modification times)"""
+        entries = []
+        for csv_file in sorted(f for f in os.listdir(folder_path) if f.endswith('.csv')):
+            stat = os.stat(os.path.join(folder_path, csv_file))
+            entries.append(f"{csv_file}:{stat.st_size}:{stat.st_mtime_ns}")
+        return _short_hash('\n'.join(entries))
+    
+    def _build_file_index(self, folder_path: str, desc: str) -> 'InChIKeyIndex':
         """Build index: InChIKey -> list of file_paths"""
         index_path = self._get_index_path(folder_path)
+        signature = f"v{_INDEX_FORMAT_VERSION}:{self._get_folder_signature(folder_path)}"
         
-        # Check if index exists
+        # Check if index exists and still matches the folder contents
         if os.path.exists(index_path):
             logger.info(f"Loading existing index for {desc}...")
             try:
-                with open(index_path, 'rb') as f:
-                    index = pickle.load(f)
-                # Check if index format is correct (should be dict with list values)
-                if isinstance(index, dict) and len(index) > 0:
-                    sample_key = list(index.keys())[0]
-                    # New format: list of file paths (strings)
-                    # Old format: list of tuples (file_path, row_offset)
-                    if isinstance(index[sample_key], list) and len(index[sample_key]) > 0:
-                        if isinstance(index[sample_key][0], str):
-                            # New format - OK
-                            logger.info(f"Index loaded successfully ({len(index)} unique InChIKeys)")
-                            return index
-                        else:
-                            # Old format - need to rebuild
-                            logger.info("Detected old index format, rebuilding with new format...")
-                            os.remove(index_path)
-                    else:
-                        # Invalid format - rebuild
-                        logger.info("Invalid index format, rebuilding...")
-                        os.remove(index_path)
+                index = InChIKeyIndex.load(index_path)
+                if index.signature == signature:
+                    logger.info(f"Index loaded successfully ({len(index)} unique InChIKeys)")
+                    return index
+                logger.info("Folder contents changed since index was built, rebuilding...")
             except Exception as e:
                 logger.warning(f"Error loading index: {e}, rebuilding...")
-                if os.path.exists(index_path):
-                    os.remove(index_path)
+            os.remove(index_path)
         
         logger.info(f"Building index for {desc} (this may take a while, but only needs to be done once)...")
-        index = {}
         
         csv_files = sorted([f for f in os.listdir(folder_path) if f.endswith('.csv')])
         logger.info(f"Indexing {len(csv_files)} files...")
         
-        for csv_file in tqdm(csv_files, desc=f"Indexing {desc}"):
-            file_path = os.path.join(folder_path, csv_file)
-            
-            # Read file in chunks and index InChIKeys
-            try:
-                chunk_count = 0
-                for chunk in pd.read_csv(file_path, chunksize=50000, encoding='utf-8', low_memory=False):
-                    chunk_count += 1
-                    if 'InChIKey' in chunk.columns:
-                        # Get unique InChIKeys in this chunk
-                        # Convert to string and normalize
-                        chunk['InChIKey'] = chunk['InChIKey'].astype(str).str.strip()
-                        # Also create cleaned version (without whitespace)
-                        chunk['InChIKey_clean'] = chunk['InChIKey'].str.replace(r'\s+', '', regex=True)
-                        
-                        # Index both original and cleaned versions
-                        for inchikey in chunk['InChIKey'].dropna().unique():
-                            inchikey = str(inchikey).strip()
-                            if inchikey and inchikey != 'nan' and inchikey.lower() != 'none':
-                                # Index original format
-                                if inchikey not in index:
-                                    index[inchikey] = []
-                                if file_path not in index[inchikey]:
-                                    index[inchikey].append(file_path)
-                                
-                                # Also index cleaned version (without whitespace)
-                                inchikey_clean = inchikey.replace(' ', '').replace('\t', '').replace('\n', '')
-                                if inchikey_clean != inchikey and inchikey_clean:
-                                    if inchikey_clean not in index:
-                                        index[inchikey_clean] = []
-                                    if file_path not in index[inchikey_clean]:
-                                        index[inchikey_clean].append(file_path)
-                        
-                        # Also index cleaned versions directly
-                        for inchikey_clean in chunk['InChIKey_clean'].dropna().unique():
-                            inchikey_clean = str(inchikey_clean).strip()
-                            if inchikey_clean and inchikey_clean != 'nan' and inchikey_clean.lower() != 'none':
-                                if inchikey_clean not in index:
-                                    index[inchikey_clean] = []
-                                if file_path not in index[inchikey_clean]:
-                                    index[inchikey_clean].append(file_path)
-                    # Log progress for large files
-                    if chunk_count % 100 == 0:
-                        logger.debug(f"  Indexed {chunk_count} chunks from {csv_file}")
-            except Exception as e:
-                logger.warning(f"Error indexing {csv_file}: {e}")
-                continue
+        file_paths = [os.path.join(folder_path, csv_file) for csv_file in csv_files]
+        keys_per_file = [set() for _ in file_paths]
+        raw_values = set()
+        
+        # Queue reads of all files up front so disk I/O overlaps with parsing
+        _prefetch_files(file_paths)
+        
+        # Files are independent, so index them in parallel worker processes
+        max_workers = min(len(file_paths), self.config.N_WORKERS or os.cpu_count() or 1)
+        if max_workers > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(_index_one_file, file_path): i
+                    for i, file_path in enumerate(file_paths)
+                }
+                for future in tqdm(as_completed(futures), total=len(futures), desc=f"Indexing {desc}"):
+                    keys_per_file[futures[future]], file_raw_values = future.result()
+                    raw_values.update(file_raw_values)
+        else:
+            for i, file_path in enumerate(tqdm(file_paths, desc=f"Indexing {desc}")):
+                keys_per_file[i], file_raw_values = _index_one_file(file_path)
+                raw_values.update(file_raw_values)
+        
+        index = InChIKeyIndex.from_file_keys(file_paths, keys_per_file, raw_values, signature)
         
         # Save index
-        with open(index_path, 'wb') as f:
-            pickle.dump(index, f)
+        index.save(index_path)
         logger.info(f"Index saved to {index_path} (contains {len(index)} unique InChIKeys)")
         
         return index
     
-    def query_by_inchikey(self, folder_path: str, inchikey: str, desc: str = "") -> pd.DataFrame:
-        """Query data by InChIKey - only loads relevant files"""
+    def _get_range_stats(self, folder_path: str, mz_col: str, rt_col: str) -> dict:
+        """Get per-file (mz_min, mz_max, rt_min, rt_max) of a folder, building it once"""
+        cache_key = (folder_path, mz_col, rt_col)
+        if cache_key in self.range_stats:
+            return self.range_stats[cache_key]
+        
+        signature = self._get_folder_signature(folder_path)
+        path_hash = _short_hash(f"{folder_path}|{mz_col}|{rt_col}")
+        stats_path = os.path.join(self.index_cache_dir, f"range_{os.path.basename(folder_path)}_{path_hash}.npz")
+        
+        if os.path.exists(stats_path):
+            try:
+                with np.load(stats_path, allow_pickle=False) as data:
+                    if str(data['signature']) == signature:
+                        stats = dict(zip(data['csv_files'].tolist(), map(tuple, data['ranges'].tolist())))
+                        self.range_stats[cache_key] = stats
+                        return stats
+            except Exception as e:
+                logger.warning(f"Error loading range statistics: {e}, rebuilding...")
+        
+        logger.info(f"Building m/z and RT range statistics for {folder_path}...")
+        csv_files = sorted([f for f in os.listdir(folder_path) if f.endswith('.csv')])
+        ranges = np.empty((len(csv_files), 4), dtype=np.float64)
+        for i, csv_file in enumerate(tqdm(csv_files, desc="Building range statistics")):
+            mz_min = mz_max = rt_min = rt_max = np.nan
+            try:
+                for chunk in pd.read_csv(os.path.join(folder_path, csv_file), chunksize=50000, encoding='utf-8',
+                                         memory_map=True, usecols=lambda col: col in (mz_col, rt_col)):
+                    if mz_col not in chunk.columns or rt_col not in chunk.columns:
+                        continue
+                    mz_values = chunk[mz_col].to_numpy(dtype=np.float64)
+                    rt_values = chunk[rt_col].to_numpy(dtype=np.float64)
+                    if len(mz_values) > 0:
+                        mz_min, mz_max = np.fmin(mz_min, np.nanmin(mz_values)), np.fmax(mz_max, np.nanmax(mz_values))
+                        rt_min, rt_max = np.fmin(rt_min, np.nanmin(rt_values)), np.fmax(rt_max, np.nanmax(rt_values))
+            except Exception as e:
+                # Unknown range, always scan this file
+                logger.warning(f"Error reading ranges of {csv_file}: {e}")
+                mz_min, mz_max, rt_min, rt_max = -np.inf, np.inf, -np.inf, np.inf
+            ranges[i] = (mz_min, mz_max, rt_min, rt_max)
+        
+        np.savez(stats_path, csv_files=np.array(csv_files, dtype=str), ranges=ranges, signature=np.array(signature))
+        stats = dict(zip(csv_files, map(tuple, ranges.tolist())))
+        self.range_stats[cache_key] = stats
+        return stats
+    
+    @staticmethod
+    def _normalize_inchikey_columns(chunk: pd.DataFrame):
+        """Strip InChIKey column and add whitespace-free InChIKey_clean column (in place)"""
+        chunk['InChIKey'] = chunk['InChIKey'].astype(str).str.strip()
+        chunk['InChIKey_clean'] = chunk['InChIKey'].str.replace(r'\s+', '', regex=True)
+    
+    @staticmethod
+    def _match_inchikey_mask(chunk: pd.DataFrame, inchikey: str) -> pd.Series:
+        """Get rows matching inchikey exactly, ignoring whitespace, or ignoring case"""
+        inchikey_clean = inchikey.replace(' ', '').replace('\t', '').replace('\n', '')
+        return (
+            (chunk['InChIKey'] == inchikey) |
+            (chunk['InChIKey_clean'] == inchikey_clean) |
+            (chunk['InChIKey'].str.lower() == inchikey.lower())
+        )
+    
+    def _get_file_index(self, folder_path: str, desc: str) -> 'InChIKeyIndex':
+        """Get the InChIKey index of a folder, building or loading it on first use"""
+        if folder_path not in self.file_indexes:
+            self.file_indexes[folder_path] = self._build_file_index(folder_path, desc)
+        return self.file_indexes[folder_path]
+    
+    @staticmethod
+    def _resolve_inchikey(index: 'InChIKeyIndex', inchikey: str) -> Optional[str]:
+        """Find the indexed spelling of an InChIKey (exact, then case-insensitive), None if absent"""
         # Normalize InChIKey
         inchikey_original = str(inchikey).strip()
         inchikey = inchikey_original
         
-        # Build or load index
-        if folder_path not in self.file_indexes:
-            self.file_indexes[folder_path] = self._build_file_index(folder_path, desc)
+        # Try exact match first
+        if inchikey in index:
+            return inchikey
         
-        index = self.file_indexes[folder_path]
+        # Try case-insensitive search
+        inchikey_lower = inchikey.lower()
+        similar_keys = []
         
-        # Try exact match first
-        if inchikey not in index:
-            # Try case-insensitive search
-            inchikey_lower = inchikey.lower()
-            found = False
-            matching_key = None
-            similar_keys = []
-            
-            for key in index.keys():
-                key_str = str(key).strip()
-                if key_str.lower() == inchikey_lower:
-                    matching_key = key_str
-                    found = True
-                    break
-                # Also collect similar keys for debugging
-                if inchikey_lower in key_str.lower() or key_str.lower() in inchikey_lower:
-                    similar_keys.append(key_str)
-            
-            if found:
-                inchikey = matching_key
-                logger.info(f"Found InChIKey with case-insensitive match: {inchikey}")
-            else:
-                # Log similar keys for debugging
-                if similar_keys:
-                    logger.warning(f"InChIKey '{inchikey_original}' not found in index, but found {len(similar_keys)} similar keys (first 5): {similar_keys[:5]}")
-                else:
-                    logger.warning(f"InChIKey '{inchikey_original}' not found in index (index contains {len(index)} keys)")
-                # Don't do full file search to avoid memory issues
-                return pd.DataFrame()
+        for key in index.keys():
+            key_str = str(key).strip()
+            if key_str.lower() == inchikey_lower:
+                logger.info(f"Found InChIKey with case-insensitive match: {key_str}")
+                return key_str
+            # Also collect similar keys for debugging
+            if inchikey_lower in key_str.lower() or key_str.lower() in inchikey_lower:
+                similar_keys.append(key_str)
+        
+        # Log similar keys for debugging
+        if similar_keys:
+            logger.warning(f"InChIKey '{inchikey_original}' not found in index, but found {len(similar_keys)} similar keys (first 5): {similar_keys[:5]}")
+        else:
+            logger.warning(f"InChIKey '{inchikey_original}' not found in index (index contains {len(index)} keys)")
+        return None
+    
+    def prepare_queries(self, pesudo_folder: str, intf_folder: str, use_avg_mz: bool = False):
+        """Build or load the InChIKey index and interference range statistics up front"""
+        self._get_file_index(pesudo_folder, "Pesudo-TQDB")
+        self._get_range_stats(intf_folder, *_interference_columns(use_avg_mz))
+    
+    def contains_inchikey(self, folder_path: str, inchikey: str, desc: str = "") -> bool:
+        """Check whether an InChIKey has rows in a folder, using only the persistent index"""
+        return self._resolve_inchikey(self._get_file_index(folder_path, desc), inchikey) is not None
+    
+    def query_by_inchikey(self, folder_path: str, inchikey: str, desc: str = "") -> pd.DataFrame:
+        """Query data by InChIKey - only loads relevant files"""
+        index = self._get_file_index(folder_path, desc)
+        inchikey = self._resolve_inchikey(index, inchikey)
+        if inchikey is None:
+            # Don't do full file search to avoid memory issues
+            return pd.DataFrame()
         
         # Load only relevant files
         all_data = []
         file_paths = index[inchikey]
         logger.info(f"Found InChIKey '{inchikey}' in {len(file_paths)} file(s)")
         
+        # Resolve which raw InChIKey spellings match, once for all files
+        raw_spellings = np.array(index.raw_spellings(inchikey), dtype=object)
+        normalized = pd.DataFrame({'InChIKey': raw_spellings})
+        self._normalize_inchikey_columns(normalized)
+        matching_raw_values = raw_spellings[self._match_inchikey_mask(normalized, inchikey).to_numpy()]
+        
         for file_path in file_paths:
             try:
-                # Read file in chunks and filter
+                # Read file in chunks and filter by raw InChIKey values, normalizing only matched rows
                 chunk_count = 0
-                for chunk in pd.read_csv(file_path, chunksize=50000, encoding='utf-8', low_memory=False):
+                for chunk in self._iter_csv_chunks(file_path):
                     chunk_count += 1
                     if 'InChIKey' in chunk.columns:
-                        # Normalize InChIKey column for comparison
-                        chunk['InChIKey'] = chunk['InChIKey'].astype(str).str.strip()
-                        # Also create cleaned version for matching
-                        chunk['InChIKey_clean'] = chunk['InChIKey'].str.replace(r'\s+', '', regex=True)
-                        inchikey_clean = inchikey.replace(' ', '').replace('\t', '').replace('\n', '')
-                        
-                        # Try multiple matching strategies
-                        mask = (
-                            (chunk['InChIKey'] == inchikey) |
-                            (chunk['InChIKey_clean'] == inchikey_clean) |
-                            (chunk['InChIKey'].str.lower() == inchikey.lower())
-                        )
-                        filtered = chunk[mask]
+                        filtered = chunk[chunk['InChIKey'].isin(matching_raw_values)]
                         if len(filtered) > 0:
+                            filtered = filtered.copy()
+                            self._normalize_inchikey_columns(filtered)
                             all_data.append(filtered)
                             logger.debug(f"Found {len(filtered)} rows in chunk {chunk_count} of {os.path.basename(file_path)}")
             except Exception as e:
@@ -304,47 +714,45 @@ class LazyFileLoader:
         csv_files = sorted([f for f in os.listdir(folder_path) if f.endswith('.csv')])
         all_data = []
         
-        # Process files in smaller batches to control memory
-        batch_size = 375  # Process files in batches
-        for i in range(0, len(csv_files), batch_size):
-            batch_files = csv_files[i:i+batch_size]
-            batch_data = []
-            
-            for csv_file in batch_files:
-                file_path = os.path.join(folder_path, csv_file)
-                try:
-                    # Read file in chunks and filter
-                    for chunk in pd.read_csv(file_path, chunksize=50000, encoding='utf-8', low_memory=False):
-                        if use_avg_mz:
-                            if 'Average Mz' in chunk.columns and 'Average Rt(min)' in chunk.columns:
-                                mask = (
-                                    (abs(chunk['Average Mz'] - precursormz) <= mz_tolerance) &
-                                    (abs(chunk['Average Rt(min)'] - rt) <= rt_tolerance)
-                                )
-                        else:
-                            if 'PrecursorMZ' in chunk.columns and 'RT' in chunk.columns:
-                                mask = (
-                                    (abs(chunk['PrecursorMZ'] - precursormz) <= mz_tolerance) &
-                                    (abs(chunk['RT'] - rt) <= rt_tolerance)
-                                )
-                            else:
-                                continue
-                        
-                        filtered = chunk[mask]
-                        if len(filtered) > 0:
-                            batch_data.append(filtered)
-                except Exception as e:
-                    logger.warning(f"Error reading {csv_file}: {e}")
-                    continue
-            
-            if batch_data:
-                all_data.append(pd.concat(batch_data, ignore_index=True))
-            
-            # Clean up after each batch
-            del batch_data
-            gc.collect()
+        mz_col, rt_col = _interference_columns(use_avg_mz)
+        
+        # Skip files whose m/z or RT range cannot contain a match
+        range_stats = self._get_range_stats(folder_path, mz_col, rt_col)
+        mz_margin = mz_tolerance + WINDOW_MARGIN
+        rt_margin = rt_tolerance + WINDOW_MARGIN
+        csv_files = [
+            csv_file for csv_file in csv_files
+            if csv_file not in range_stats or (
+                range_stats[csv_file][0] - mz_margin <= precursormz <= range_stats[csv_file][1] + mz_margin and
+                range_stats[csv_file][2] - rt_margin <= rt <= range_stats[csv_file][3] + rt_margin
+            )
+        ]
+        
+        # Stream files chunk by chunk and concatenate the matches once at the end
+        for csv_file in csv_files:
+            file_path = os.path.join(folder_path, csv_file)
+            try:
+                # Read file in chunks and filter, skipping cached chunks outside the window
+                value_ranges = {
+                    mz_col: (precursormz - mz_margin, precursormz + mz_margin),
+                    rt_col: (rt - rt_margin, rt + rt_margin),
+                }
+                for chunk in self._iter_csv_chunks(file_path, value_ranges):
+                    if mz_col not in chunk.columns or rt_col not in chunk.columns:
+                        continue
+                    
+                    filtered = chunk[_window_mask(chunk, mz_col, rt_col, precursormz, rt, mz_tolerance, rt_tolerance)]
+                    if len(filtered) > 0:
+                        all_data.append(filtered)
+            except Exception as e:
+                logger.warning(f"Error reading {csv_file}: {e}")
+                continue
         
         if all_data:
             result = pd.concat(all_data, ignore_index=True)
+            # Categorical codes make the per-compound equality filters integer compares
+            for col in _CATEGORY_COLUMNS:
+                if col in result.columns:
+                    result[col] = result[col].astype('category')
             return result
         return pd.DataFrame()
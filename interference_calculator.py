@@ -5,53 +5,135 @@
 Interference calculation module for MRM Transition Optimization Tool
 """
 
+import re
+from collections import OrderedDict
 import pandas as pd
+import numpy as np
+from typing import Tuple
 import logging
 
+from ranges import NCE_BOUNDS, WINDOW_MARGIN, energy_range_codes
+
 logger = logging.getLogger(__name__)
 
+# Matches a spectrum peak containing more than one ':' separator
+_MULTI_COLON_PEAK = re.compile(r':[^\s:]*:')
+
+
+def _ragged_positions(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenate the index ranges [start, start + length) without a Python loop"""
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets
+
+
+def _window_hits(values: np.ndarray, targets: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Find (target index, value position) pairs with |target - value| <= tolerance using sorted values"""
+    starts = np.searchsorted(values, targets - tolerance - WINDOW_MARGIN, side='left')
+    ends = np.searchsorted(values, targets + tolerance + WINDOW_MARGIN, side='right')
+    lengths = ends - starts
+    target_idx = np.repeat(np.arange(len(targets)), lengths)
+    positions = _ragged_positions(starts, lengths)
+    mask = np.abs(targets[target_idx] - values[positions]) <= tolerance
+    return target_idx[mask], positions[mask]
+
 
 class InterferenceCalculatorQE:
     """Interference calculator for QE method"""
     
     def __init__(self, config):
         self.config = config
-        self._msms_cache = {}  # Cache for parsed MS/MS spectra
+        # LRU cache for parsed MS/MS spectra: spectrum -> (mzs, intensities)
+        self._msms_cache = OrderedDict()
     
     def extract_intensity_from_msms_cached(self, msms_spectrum: str, target_ion: float) -> float:
         """Extract intensity for a specific ion from MS/MS spectrum (with caching)"""
         if pd.isna(msms_spectrum) or msms_spectrum == '':
             return 0.0
         
-        # Use cache to avoid repeated parsing
-        cache_key = f"{msms_spectrum}_{target_ion}"
-        if cache_key in self._msms_cache:
-            return self._msms_cache[cache_key]
+        mzs, intensities = self._parse_cached(msms_spectrum)
+        return float(intensities[np.abs(mzs - target_ion) <= self.config.MSMS_TOLERANCE].sum())
+    
+    def prepare_peaks(self, spectra: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """Pool the peaks of all MS/MS spectra into (mzs sorted, intensities) arrays"""
+        spectra = spectra[spectra.notna() & (spectra != '')]
+        if len(spectra) == 0:
+            return np.empty(0), np.empty(0)
         
-        try:
-            peaks = msms_spectrum.split()
-            total_intensity = 0.0
-            
-            for peak in peaks:
-                if ':' in peak:
-                    parts = peak.split(':', 1)
-                    if len(parts) == 2:
-                        try:
-                            mz = float(parts[0])
-                            intensity = float(parts[1])
-                            
-                            if abs(mz - target_ion) <= self.config.MSMS_TOLERANCE:
-                                total_intensity += intensity
-                        except (ValueError, IndexError):
-                            continue
-            
-            # Cache result
-            self._msms_cache[cache_key] = total_intensity
-            return total_intensity
-            
-        except Exception:
-            self._msms_cache[cache_key] = 0.0
-            return 0.0
+        # Parse each distinct spectrum once into flat arrays with per-spectrum offsets
+        codes, unique_spectra = pd.factorize(spectra)
+        parsed = [self._parse_cached(spectrum) for spectrum in unique_spectra]
+        unique_mzs = np.concatenate([p[0] for p in parsed])
+        unique_intensities = np.concatenate([p[1] for p in parsed])
+        peak_counts = np.array([len(p[0]) for p in parsed], dtype=np.int64)
+        peak_offsets = np.cumsum(peak_counts) - peak_counts
+        
+        # Expand to one peak list per interference row
+        positions = _ragged_positions(peak_offsets[codes], peak_counts[codes])
+        mzs = unique_mzs[positions]
+        intensities = unique_intensities[positions]
+        order = np.argsort(mzs, kind='stable')
+        return mzs[order], intensities[order]
+    
+    def sum_intensities(self, peaks: Tuple[np.ndarray, np.ndarray], target_ions: np.ndarray) -> np.ndarray:
+        """Sum pooled peak intensities within MSMS_TOLERANCE of each target ion"""
+        mzs, intensities = peaks
+        target_ions = np.asarray(target_ions, dtype=np.float64)
+        if len(mzs) == 0 or len(target_ions) == 0:
+            return np.zeros(len(target_ions))
+        
+        # Each target ion is repeated across many pairs, so sum once per distinct ion
+        unique_ions, inverse = np.unique(target_ions, return_inverse=True)
+        hit_ions, hit_pos = _window_hits(mzs, unique_ions, self.config.MSMS_TOLERANCE)
+        sums = np.bincount(hit_ions, weights=intensities[hit_pos], minlength=len(unique_ions))
+        return sums[inverse]
+    
+    def _parse_cached(self, msms_spectrum: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Parse an MS/MS spectrum through the LRU cache"""
+        # Use cache to parse each spectrum only once, evicting the least recently used
+        parsed = self._msms_cache.get(msms_spectrum)
+        if parsed is None:
+            try:
+                parsed = self.parse_msms_spectrum(msms_spectrum)
+            except Exception:
+                parsed = (np.empty(0), np.empty(0))
+            if self.config.MSMS_CACHE_SIZE > 0:
+                self._msms_cache[msms_spectrum] = parsed
+                if len(self._msms_cache) > self.config.MSMS_CACHE_SIZE:
+                    self._msms_cache.popitem(last=False)
+        else:
+            self._msms_cache.move_to_end(msms_spectrum)
+        return parsed
+    
+    @staticmethod
+    def parse_msms_spectrum(msms_spectrum: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Parse 'mz:intensity' peaks of an MS/MS spectrum into m/z and intensity arrays"""
+        peaks = msms_spectrum.split()
+        
+        # Fast path: every peak is a well-formed 'mz:intensity' pair
+        if msms_spectrum.count(':') == len(peaks) and not _MULTI_COLON_PEAK.search(msms_spectrum):
+            try:
+                values = np.array(msms_spectrum.replace(':', ' ').split(), dtype=np.float64)
+                if len(values) == 2 * len(peaks):
+                    values = values.reshape(-1, 2)
+                    return values[:, 0].copy(), values[:, 1].copy()
+            except ValueError:
+                pass
+        
+        # Slow path: skip malformed peaks one by one
+        mzs = []
+        intensities = []
+        for peak in peaks:
+            if ':' in peak:
+                parts = peak.split(':', 1)
+                try:
+                    mz = float(parts[0])
+                    intensity = float(parts[1])
+                except (ValueError, IndexError):
+                    continue
+                mzs.append(mz)
+                intensities.append(intensity)
+        
+        return np.array(mzs, dtype=np.float64), np.array(intensities, dtype=np.float64)
 
 
 class InterferenceCalculatorNIST:
@@ -60,89 +142,112 @@ class InterferenceCalculatorNIST:
     def __init__(self, config):
         self.config = config
     
+    @staticmethod
+    def prepare_bucket(different_inchikey_rows: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """Convert interference rows of one NCE range to (msms, inchikey) arrays sorted by MSMS"""
+        if len(different_inchikey_rows) == 0 or 'MSMS' not in different_inchikey_rows.columns:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=object)
+        msms = different_inchikey_rows['MSMS'].to_numpy(dtype=np.float64)
+        order = np.argsort(msms, kind='stable')
+        return msms[order], different_inchikey_rows['InChIKey'].to_numpy()[order]
+    
     def process_combination(self, index, row, different_inchikey_rows_low, different_inchikey_rows_medium, 
                            different_inchikey_rows_high, coverage_low, coverage_medium, coverage_high, coverage_all):
-        """Interference calculation for NIST method"""
-        quan_ion = row['MSMS1']
-        quan_ion_intensity = row['intensity1']
-        quan_ion_nce = row['NCE1']
-        quan_ion_ce = row['CE1']
-
-        qual_ion = row['MSMS2']
-        qual_ion_intensity = row['intensity2']
-        qual_ion_nce = row['NCE2']
-        qual_ion_ce = row['CE2']
+        """Interference calculation for a single ion pair in NIST method (see process_combinations_batch)"""
+        hit_nums, hit_rates = self.process_combinations_batch(
+            pd.DataFrame([row]), self.prepare_bucket(different_inchikey_rows_low),
+            self.prepare_bucket(different_inchikey_rows_medium), self.prepare_bucket(different_inchikey_rows_high),
+            coverage_all
+        )
+        return int(hit_nums[0]), hit_rates[0]
+    
+    def process_combinations_batch(self, candidate_df: pd.DataFrame, bucket_low, bucket_medium, 
+                                   bucket_high, coverage_all) -> Tuple[np.ndarray, np.ndarray]:
+        """Interference calculation for all ion pairs of a compound at once (NIST method)"""
+        n_rows = len(candidate_df)
+        buckets = [bucket_low, bucket_medium, bucket_high]
         
-        # Select coverage based on NCE
-        if quan_ion_nce <= 60.0:    
-            coverage1 = coverage_low
-        elif 60.0 < quan_ion_nce <= 120.0:
-            coverage1 = coverage_medium
-        elif quan_ion_nce > 120.0:
-            coverage1 = coverage_high
-        else:
-            coverage1 = 0
+        # Encode InChIKeys of all NCE ranges as shared integer codes
+        codes, uniques = pd.factorize(
+            np.concatenate([inchikeys for _, inchikeys in buckets]), use_na_sentinel=False
+        )
+        n_codes = max(len(uniques), 1)
+        bucket_sizes = [len(msms) for msms, _ in buckets]
+        bucket_codes = np.split(codes, np.cumsum(bucket_sizes)[:-1])
+        
+        # Both ions of all pairs, flattened as (row, ion, NCE range)
+        all_rows = np.tile(np.arange(n_rows, dtype=np.int64), 2)
+        all_ions = np.concatenate([candidate_df['MSMS1'].to_numpy(dtype=np.float64),
+                                   candidate_df['MSMS2'].to_numpy(dtype=np.float64)])
+        all_buckets = self.nce_to_bucket(np.concatenate([candidate_df['NCE1'].to_numpy(dtype=np.float64),
+                                                         candidate_df['NCE2'].to_numpy(dtype=np.float64)]))
+        
+        # Collect (row, InChIKey code) pairs of every interfering row for both ions.
+        # Each ion occurs in many pairs, so its InChIKey code set is computed once
+        # per distinct ion and then expanded to the pairs that use it.
+        pair_keys = []
+        for b, (msms, _) in enumerate(buckets):
+            sel = np.flatnonzero(all_buckets == b)
+            if len(sel) == 0 or len(msms) == 0:
+                continue
+            unique_ions, ion_inverse = np.unique(all_ions[sel], return_inverse=True)
+            hit_ions, hit_pos = _window_hits(msms, unique_ions, 1)
+            ion_code_keys = np.unique(hit_ions.astype(np.int64) * n_codes + bucket_codes[b][hit_pos])
+            ion_codes = ion_code_keys % n_codes
+            ion_counts = np.bincount(ion_code_keys // n_codes, minlength=len(unique_ions))
+            ion_starts = np.cumsum(ion_counts) - ion_counts
             
-        if qual_ion_nce <= 60.0:    
-            coverage2 = coverage_low
-        elif 60.0 < qual_ion_nce <= 120.0:
-            coverage2 = coverage_medium
-        elif qual_ion_nce > 120.0:
-            coverage2 = coverage_high
+            lengths = ion_counts[ion_inverse]
+            positions = _ragged_positions(ion_starts[ion_inverse], lengths)
+            pair_keys.append(np.repeat(all_rows[sel], lengths) * n_codes + ion_codes[positions])
+        
+        if pair_keys:
+            unique_pairs = np.unique(np.concatenate(pair_keys))
+            hit_nums = np.bincount(unique_pairs // n_codes, minlength=n_rows)
         else:
-            coverage2 = 0
+            hit_nums = np.zeros(n_rows, dtype=np.int64)
         
-        coverage = coverage_all
-
-        # Process data for different CE ranges
-        result_rows1 = self.process_ce_range(different_inchikey_rows_low, different_inchikey_rows_medium, 
-                                           different_inchikey_rows_high, quan_ion, quan_ion_nce)
-        result_rows2 = self.process_ce_range(different_inchikey_rows_low, different_inchikey_rows_medium, 
-                                           different_inchikey_rows_high, qual_ion, qual_ion_nce)
-
-        common_inchikeys = set(result_rows1["InChIKey"]).union(set(result_rows2["InChIKey"]))
-        hit_num = len(common_inchikeys)
-        hit_rate = 0
-        if coverage != 0:
-            hit_rate = len(common_inchikeys)/coverage
-
-        return hit_num, hit_rate
+        if coverage_all != 0:
+            hit_rates = hit_nums / coverage_all
+        else:
+            hit_rates = np.zeros(n_rows, dtype=np.int64)
+        
+        return hit_nums, hit_rates
+    
+    @staticmethod
+    def nce_to_bucket(nces: np.ndarray) -> np.ndarray:
+        """Map NCE values to range index: 0 = low (<= 60), 1 = medium (<= 120), 2 = high, -1 = missing"""
+        return energy_range_codes(nces, NCE_BOUNDS)
     
     def process_single_ion(self, row, different_inchikey_rows_low, different_inchikey_rows_medium, 
                            different_inchikey_rows_high, coverage_low, coverage_medium, coverage_high, coverage_all):
-        """Interference calculation for single ion in NIST method"""
+        """Interference calculation for single ion in NIST method (see process_combinations_batch)"""
         ion = row['MSMS']
         ion_nce = row['NCE']
         
-        # Select coverage based on NCE
-        if ion_nce <= 60.0:    
-            coverage = coverage_low
-        elif 60.0 < ion_nce <= 120.0:
-            coverage = coverage_medium
-        elif ion_nce > 120.0:
-            coverage = coverage_high
-        else:
-            coverage = 0
-        
-        # Process data for the CE range
-        result_rows = self.process_ce_range(different_inchikey_rows_low, different_inchikey_rows_medium, 
-                                           different_inchikey_rows_high, ion, ion_nce)
+        # Pairing the ion with itself counts the InChIKeys interfering with that ion alone
+        pair_df = pd.DataFrame({'MSMS1': [ion], 'NCE1': [ion_nce], 'MSMS2': [ion], 'NCE2': [ion_nce]})
+        hit_nums, _ = self.process_combinations_batch(
+            pair_df, self.prepare_bucket(different_inchikey_rows_low),
+            self.prepare_bucket(different_inchikey_rows_medium), self.prepare_bucket(different_inchikey_rows_high),
+            coverage_all
+        )
+        hit_num = int(hit_nums[0])
         
-        hit_num = len(result_rows["InChIKey"].unique()) if len(result_rows) > 0 else 0
+        # Select coverage based on NCE
+        bucket = self.nce_to_bucket(np.array([ion_nce], dtype=np.float64))[0]
+        coverage = (coverage_low, coverage_medium, coverage_high)[bucket] if bucket >= 0 else 0
         hit_rate = 0
         if coverage != 0:
             hit_rate = hit_num / coverage
         
         return hit_num, hit_rate
     
-    def process_ce_range(self, different_inchikey_rows_low, different_inchikey_rows_medium, 
-                        different_inchikey_rows_high, ion, nce):
-        """CE range processing for NIST method"""
-        if nce <= 60.0:    
-            return different_inchikey_rows_low[abs(ion - different_inchikey_rows_low['MSMS']) <= 1]
-        elif 60.0 < nce <= 120.0:
-            return different_inchikey_rows_medium[abs(ion - different_inchikey_rows_medium['MSMS']) <= 1]
-        elif nce > 120.0:
-            return different_inchikey_rows_high[abs(ion - different_inchikey_rows_high['MSMS']) <= 1]
-        else:
-            return pd.DataFrame()
+    def process_ce_range(self, bucket_low, bucket_medium, bucket_high, ion, nce) -> np.ndarray:
+        """CE range processing for NIST method, returns InChIKeys of interfering rows"""
+        bucket = self.nce_to_bucket(np.array([nce], dtype=np.float64))[0]
+        if bucket < 0:
+            return np.empty(0, dtype=object)
+        msms, inchikeys = (bucket_low, bucket_medium, bucket_high)[bucket]
+        _, positions = _window_hits(msms, np.array([ion], dtype=np.float64), 1)
+        return inchikeys[positions]
@@ -5,15 +5,70 @@
 Ion pair optimization module for MRM Transition Optimization Tool
 """
 
+import bisect
 import pandas as pd
 import numpy as np
-from itertools import combinations
 from typing import Dict, Tuple
 import logging
 
+from ranges import CE_BOUNDS, NCE_BOUNDS, energy_range_codes
+
 logger = logging.getLogger(__name__)
 
 
+def _ion_pairs(ions: pd.DataFrame, positions: np.ndarray, columns: Tuple[str, ...],
+               min_diff: float) -> pd.DataFrame:
+    """Build candidate ion pairs (in itertools.combinations order) from the rows at the given positions"""
+    # All index pairs (i < j) as index arithmetic, no per-pair Python objects
+    msms = ions['MSMS'].to_numpy()[positions]
+    first, second = np.triu_indices(len(positions), k=1)
+    keep = (msms[first] != msms[second]) & (np.abs(msms[first] - msms[second]) >= min_diff)
+    first, second = positions[first[keep]], positions[second[keep]]
+    
+    return pd.DataFrame({
+        f'{col}{suffix}': ions[col].to_numpy()[idx]
+        for suffix, idx in (('1', first), ('2', second))
+        for col in columns
+    })
+
+
+def _ordered_msms_pair(candidate_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the smaller and larger m/z of each ion pair"""
+    msms1 = candidate_df['MSMS1'].to_numpy()
+    msms2 = candidate_df['MSMS2'].to_numpy()
+    return np.minimum(msms1, msms2), np.maximum(msms1, msms2)
+
+
+def _top_k_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, highest first; ties keep the earlier row like nlargest"""
+    is_nan = np.isnan(scores)
+    positions = np.flatnonzero(~is_nan)
+    if len(positions) > k:
+        # Partial selection of the k-th highest score, then sort only the rows above it
+        kth_score = np.partition(scores[positions], len(positions) - k)[len(positions) - k]
+        positions = positions[scores[positions] >= kth_score]
+    positions = positions[np.argsort(-scores[positions], kind='stable')][:k]
+    # Like nlargest, fill up with missing scores last when there are fewer than k scores
+    return np.concatenate([positions, np.flatnonzero(is_nan)[:k - len(positions)]])
+
+
+def _top_ions_per_range(ions: pd.DataFrame, energy_col: str, bounds: np.ndarray, top_n: int) -> pd.DataFrame:
+    """Keep the top_n most intense distinct ions of each collision energy range, low range first"""
+    # Determine which name column to use
+    name_col = 'Name_x' if 'Name_x' in ions.columns else 'Name'
+    
+    # Rows with missing energy belong to no range
+    energy_range = energy_range_codes(ions[energy_col], bounds)
+    ranked = ions.assign(_energy_range=energy_range)[energy_range >= 0]
+    
+    # One sort for all ranges, then deduplicate and take the top N per range
+    ranked = ranked.sort_values(['_energy_range', 'intensity'], ascending=[True, False], kind='stable')
+    ranked = ranked.drop_duplicates(['_energy_range', name_col, 'MSMS'], keep='first')
+    ranked = ranked.groupby('_energy_range', sort=False).head(top_n)
+    
+    return ranked.drop(columns='_energy_range').reset_index(drop=True)
+
+
 class IonPairOptimizerQE:
     """Ion pair optimizer for QE method"""
     
@@ -23,146 +78,98 @@ class IonPairOptimizerQE:
     
     def filter_and_rank_ions(self, working_group: pd.DataFrame) -> pd.DataFrame:
         """Filter and rank ions"""
-        # Group by CE
-        ce_groups = {
-            'low': working_group[working_group['CE'] <= 20.0],
-            'medium': working_group[
-                (working_group['CE'] > 20.0) & 
-                (working_group['CE'] <= 40.0)
-            ],
-            'high': working_group[working_group['CE'] > 40.0]
-        }
-        
-        # Determine which name column to use
-        name_col = 'Name_x' if 'Name_x' in working_group.columns else 'Name'
-        
-        filtered_ions = []
-        
-        for ce_level, group in ce_groups.items():
-            if len(group) > 0:
-                # Sort by intensity
-                group_sorted = group.sort_values('intensity', ascending=False)
-                # Deduplicate
-                group_dedup = group_sorted.drop_duplicates([name_col, 'MSMS'], keep='first')
-                # Take top N
-                group_filtered = group_dedup.head(self.config.MAX_IONS_PER_CE)
-                filtered_ions.append(group_filtered)
-        
-        return pd.concat(filtered_ions, ignore_index=True) if filtered_ions else pd.DataFrame()
+        return _top_ions_per_range(working_group, 'CE', CE_BOUNDS, self.config.MAX_IONS_PER_CE)
     
     def generate_ion_pairs(self, ions_df: pd.DataFrame) -> pd.DataFrame:
         """Generate ion pair combinations"""
         if len(ions_df) < 2:
             return pd.DataFrame()
         
-        combinations_list = list(combinations(ions_df.iterrows(), 2))
-        candidate_data = []
-        
-        for (index1, row1), (index2, row2) in combinations_list:
-            if (row1['MSMS'] != row2['MSMS'] and 
-                abs(row1['MSMS'] - row2['MSMS']) >= self.config.ION_PAIR_MIN_DIFF):
-                candidate_data.append([
-                    row1['MSMS'], row1['intensity'], row1['CE'],
-                    row2['MSMS'], row2['intensity'], row2['CE']
-                ])
+        candidate_df = _ion_pairs(ions_df, np.arange(len(ions_df)), ('MSMS', 'intensity', 'CE'),
+                                  self.config.ION_PAIR_MIN_DIFF)
         
-        if not candidate_data:
+        if len(candidate_df) == 0:
             return pd.DataFrame()
         
-        candidate_df = pd.DataFrame(candidate_data, columns=[
-            'MSMS1', 'intensity1', 'CE1', 'MSMS2', 'intensity2', 'CE2'
-        ])
-        
         return candidate_df
     
     def calculate_scores(self, 
                         candidate_df: pd.DataFrame, 
                         interference_data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         """Calculate scores"""
-        # Calculate interference levels
-        target_ions_1 = candidate_df['MSMS1'].values
-        target_ions_2 = candidate_df['MSMS2'].values
-        
-        interference_levels_1 = np.zeros(len(candidate_df))
-        interference_levels_2 = np.zeros(len(candidate_df))
-        
-        for index, row in candidate_df.iterrows():
-            ce1 = row['CE1']
-            ce2 = row['CE2']
-            
-            # Select interference data based on CE
-            if ce1 <= 20.0:
-                intf_data_1 = interference_data['low']
-            elif ce1 <= 40.0:
-                intf_data_1 = interference_data['medium']
-            else:
-                intf_data_1 = interference_data['high']
-            
-            if ce2 <= 20.0:
-                intf_data_2 = interference_data['low']
-            elif ce2 <= 40.0:
-                intf_data_2 = interference_data['medium']
-            else:
-                intf_data_2 = interference_data['high']
-            
-            # Calculate interference levels
-            interference_levels_1[index] = sum(
-                self.interference_calc.extract_intensity_from_msms_cached(
-                    intf_row['MS/MS spectrum'], row['MSMS1']
-                ) for _, intf_row in intf_data_1.iterrows()
-            )
-            
-            interference_levels_2[index] = sum(
-                self.interference_calc.extract_intensity_from_msms_cached(
-                    intf_row['MS/MS spectrum'], row['MSMS2']
-                ) for _, intf_row in intf_data_2.iterrows()
-            )
-        
-        candidate_df['interference_level1'] = interference_levels_1
-        candidate_df['interference_level2'] = interference_levels_2
-        candidate_df['intensity_sum'] = candidate_df['intensity1'] + candidate_df['intensity2']
-        candidate_df['interference_level_sum'] = interference_levels_1 + interference_levels_2
-        
-        # Calculate scores
-        max_intensity = candidate_df['intensity_sum'].max()
-        max_interference = candidate_df['interference_level_sum'].max()
+        if len(candidate_df) == 0:
+            return candidate_df
+        
+        # Both ions of all pairs with their CE range index (0: <= 20, 1: <= 40, 2: higher or missing)
+        target_ions = np.concatenate([candidate_df['MSMS1'].to_numpy(dtype=np.float64),
+                                      candidate_df['MSMS2'].to_numpy(dtype=np.float64)])
+        ce_values = np.concatenate([candidate_df['CE1'].to_numpy(dtype=np.float64),
+                                    candidate_df['CE2'].to_numpy(dtype=np.float64)])
+        ce_idx = energy_range_codes(ce_values, CE_BOUNDS, missing=2)
+        
+        # Calculate interference levels of both ions with one lookup per CE range,
+        # pooling interference peaks only for CE ranges the candidate ions use
+        levels = np.zeros(len(target_ions))
+        for b, ce_level in enumerate(['low', 'medium', 'high']):
+            rows = np.flatnonzero(ce_idx == b)
+            intf_data = interference_data[ce_level]
+            if len(rows) == 0 or 'MS/MS spectrum' not in intf_data.columns:
+                continue
+            peaks = self.interference_calc.prepare_peaks(intf_data['MS/MS spectrum'])
+            levels[rows] = self.interference_calc.sum_intensities(peaks, target_ions[rows])
+        interference_levels_1, interference_levels_2 = np.split(levels, 2)
+        
+        intensity_sum = candidate_df['intensity1'].to_numpy() + candidate_df['intensity2'].to_numpy()
+        interference_level_sum = interference_levels_1 + interference_levels_2
+        
+        # Calculate scores on NumPy arrays, all result columns are assigned at once
+        max_intensity = np.nanmax(intensity_sum)
+        max_interference = np.nanmax(interference_level_sum)
         
         if max_intensity > 0 and max_interference > 0:
-            # Calculate scoring metrics
-            candidate_df['sensitivity_score'] = candidate_df['intensity_sum'] / max_intensity
-            candidate_df['specificity_score'] = -(1 + candidate_df['interference_level_sum']) / (1 + max_interference)
-            candidate_df['intensity_score'] = candidate_df['intensity_sum'] / max_intensity
-            candidate_df['interference_score'] = -(1 + candidate_df['interference_level_sum']) / (1 + max_interference)
-            
-            # Combined score
-            candidate_df['score'] = (
-                candidate_df['sensitivity_score'] * self.config.SENSITIVITY_WEIGHT +
-                candidate_df['specificity_score'] * self.config.SPECIFICITY_WEIGHT
-            )
+            # Calculate scoring metrics (intensity/interference scores equal sensitivity/specificity)
+            sensitivity_score = intensity_sum / max_intensity
+            specificity_score = -(1 + interference_level_sum) / (1 + max_interference)
+            scores = {
+                'sensitivity_score': sensitivity_score,
+                'specificity_score': specificity_score,
+                'intensity_score': sensitivity_score,
+                'interference_score': specificity_score,
+                # Combined score
+                'score': (
+                    sensitivity_score * self.config.SENSITIVITY_WEIGHT +
+                    specificity_score * self.config.SPECIFICITY_WEIGHT
+                ),
+            }
         else:
-            candidate_df['score'] = candidate_df['intensity_sum']
-            candidate_df['sensitivity_score'] = candidate_df['intensity_sum']
-            candidate_df['specificity_score'] = -candidate_df['interference_level_sum']
-            candidate_df['intensity_score'] = candidate_df['intensity_sum']
-            candidate_df['interference_score'] = -candidate_df['interference_level_sum']
+            scores = {
+                'score': intensity_sum,
+                'sensitivity_score': intensity_sum,
+                'specificity_score': -interference_level_sum,
+                'intensity_score': intensity_sum,
+                'interference_score': -interference_level_sum,
+            }
+        
+        candidate_df = candidate_df.assign(
+            interference_level1=interference_levels_1,
+            interference_level2=interference_levels_2,
+            intensity_sum=intensity_sum,
+            interference_level_sum=interference_level_sum,
+            **scores
+        )
         
         return candidate_df
     
     def select_best_pairs(self, candidate_df: pd.DataFrame) -> Tuple[pd.Series, pd.DataFrame]:
         """Select best ion pairs"""
-        # Deduplication
-        candidate_df['MSMS_combined'] = candidate_df.apply(
-            lambda row: tuple(sorted([row['MSMS1'], row['MSMS2']])), axis=1
-        )
-        candidate_df = candidate_df.loc[candidate_df.groupby('MSMS_combined')['score'].idxmax()]
-        candidate_df = candidate_df.drop(columns=['MSMS_combined'])
-        
-        # Get best combination
-        max_row = candidate_df.loc[candidate_df["score"].idxmax()]
+        # Deduplication by unordered MSMS pair (smaller m/z, larger m/z)
+        msms_low, msms_high = _ordered_msms_pair(candidate_df)
+        candidate_df = candidate_df.loc[candidate_df.groupby([msms_low, msms_high])['score'].idxmax()]
         
-        # Get top 5 best combinations (CE conversion will be done in MRMOptimizer)
-        max5_rows = candidate_df.nlargest(5, 'score').copy()
-        max5_rows = max5_rows.reset_index(drop=True)
+        # Get top 5 best combinations, the first one is the best (CE conversion will be done in MRMOptimizer)
+        top_positions = _top_k_positions(candidate_df['score'].to_numpy(dtype=np.float64), 5)
+        max_row = candidate_df.iloc[top_positions[0]]
+        max5_rows = candidate_df.iloc[top_positions].reset_index(drop=True)
         
         return max_row, max5_rows
 
@@ -176,30 +183,7 @@ class IonPairOptimizerNIST:
     
     def filter_and_rank_ions(self, working_group_inchikey: pd.DataFrame) -> pd.DataFrame:
         """Filter and rank ions for NIST method"""
-        # Determine which name column to use
-        name_col = 'Name_x' if 'Name_x' in working_group_inchikey.columns else 'Name'
-        
-        # Split working_group_inchikey into three sub-tables by NCE
-        working_group_inchikey_low = working_group_inchikey[working_group_inchikey['NCE'] <= 60.0]
-        working_group_inchikey_low = working_group_inchikey_low.sort_values('intensity', ascending=False)
-        working_group_inchikey_low = working_group_inchikey_low.drop_duplicates([name_col, 'MSMS'], keep='first')
-        working_group_inchikey_low = working_group_inchikey_low.head(10)
-        
-        working_group_inchikey_medium = working_group_inchikey[
-            (working_group_inchikey['NCE'] > 60.0) & (working_group_inchikey['NCE'] <= 120.0)
-        ]
-        working_group_inchikey_medium = working_group_inchikey_medium.sort_values('intensity', ascending=False)
-        working_group_inchikey_medium = working_group_inchikey_medium.drop_duplicates([name_col, 'MSMS'], keep='first')
-        working_group_inchikey_medium = working_group_inchikey_medium.head(10)
-        
-        working_group_inchikey_high = working_group_inchikey[working_group_inchikey['NCE'] > 120.0]
-        working_group_inchikey_high = working_group_inchikey_high.sort_values('intensity', ascending=False)
-        working_group_inchikey_high = working_group_inchikey_high.drop_duplicates([name_col, 'MSMS'], keep='first')
-        working_group_inchikey_high = working_group_inchikey_high.head(10)
-        
-        working_group = pd.concat([working_group_inchikey_low, working_group_inchikey_medium, working_group_inchikey_high], ignore_index=True)
-        
-        return working_group
+        return _top_ions_per_range(working_group_inchikey, 'NCE', NCE_BOUNDS, 10)
     
     def generate_ion_pairs(self, working_group: pd.DataFrame) -> pd.DataFrame:
         """Generate ion pair combinations for NIST method"""
@@ -211,100 +195,103 @@ class IonPairOptimizerNIST:
         
         # Deduplicate MSMS with tolerance 0.001 da (keep the one with highest intensity)
         msms_tolerance = 0.001
-        unique_ions = []
-        used_msms = []
-        
-        for index, row in working_group_sorted.iterrows():
-            msms = row['MSMS']
-            # Check if this MSMS is too close to any already selected MSMS
-            is_too_close = False
-            for used_msms_val in used_msms:
-                if abs(msms - used_msms_val) < msms_tolerance:
-                    is_too_close = True
-                    break
+        unique_positions = []
+        used_msms = []  # Kept sorted, so only the two neighbours need checking
+        
+        for position, msms in enumerate(working_group_sorted['MSMS'].to_numpy(dtype=np.float64)):
+            if np.isnan(msms):
+                # NaN is never too close to anything
+                unique_positions.append(position)
+                continue
+            # Check if this MSMS is too close to the nearest already selected MSMS
+            insert_at = bisect.bisect_left(used_msms, msms)
+            is_too_close = (
+                (insert_at > 0 and msms - used_msms[insert_at - 1] < msms_tolerance) or
+                (insert_at < len(used_msms) and used_msms[insert_at] - msms < msms_tolerance)
+            )
             
             if not is_too_close:
-                unique_ions.append(row.to_dict())
-                used_msms.append(msms)
+                unique_positions.append(position)
+                used_msms.insert(insert_at, msms)
         
-        if len(unique_ions) < 2:
+        if len(unique_positions) < 2:
             return pd.DataFrame()
         
         # Generate ion pair combinations from unique ions
-        unique_ions_df = pd.DataFrame(unique_ions).reset_index(drop=True)
-        combinations_list = list(combinations(unique_ions_df.iterrows(), 2))
-        
-        candidate_columns = ['MSMS1', 'intensity1', 'NCE1', 'CE1', 'MSMS2', 'intensity2', 'NCE2', 'CE2']
-        candidate_data = []
-        
-        for (index1, row1), (index2, row2) in combinations_list:
-            if row1['MSMS'] != row2['MSMS'] and abs(row1['MSMS'] - row2['MSMS']) >= 2.0:
-                candidate_data.append([
-                    row1['MSMS'], row1['intensity'], row1['NCE'], row1['CE'],
-                    row2['MSMS'], row2['intensity'], row2['NCE'], row2['CE']
-                ])
-        
-        candidate_df = pd.DataFrame(candidate_data, columns=candidate_columns)
+        candidate_df = _ion_pairs(working_group_sorted, np.array(unique_positions),
+                                  ('MSMS', 'intensity', 'NCE', 'CE'), 2.0)
         return candidate_df
     
     def calculate_scores(self, candidate_df: pd.DataFrame, different_inchikey_rows_low, 
                         different_inchikey_rows_medium, different_inchikey_rows_high,
                         coverage_low, coverage_medium, coverage_high, coverage_all) -> pd.DataFrame:
         """Calculate scores for NIST method (ion pair mode)"""
-        # Calculate interference for each ion pair
-        hit_nums = []
-        hit_rates = []
-        
-        for index, row in candidate_df.iterrows():
-            hit_num, hit_rate = self.interference_calc.process_combination(
-                index, row, different_inchikey_rows_low, different_inchikey_rows_medium, 
-                different_inchikey_rows_high, coverage_low, coverage_medium, coverage_high, coverage_all
-            )
-            hit_nums.append(hit_num)
-            hit_rates.append(hit_rate)
+        if len(candidate_df) == 0:
+            return candidate_df
+        
+        # Convert interference rows to NumPy arrays once per NCE range, skipping
+        # NCE ranges no candidate ion falls into
+        used_ranges = set(self.interference_calc.nce_to_bucket(np.concatenate([
+            candidate_df['NCE1'].to_numpy(dtype=np.float64), candidate_df['NCE2'].to_numpy(dtype=np.float64)
+        ])).tolist())
+        bucket_low, bucket_medium, bucket_high = [
+            self.interference_calc.prepare_bucket(rows if b in used_ranges else pd.DataFrame())
+            for b, rows in enumerate([different_inchikey_rows_low, different_inchikey_rows_medium,
+                                      different_inchikey_rows_high])
+        ]
         
-        candidate_df['hit_num'] = hit_nums
-        candidate_df['hit_rate'] = hit_rates
+        # Calculate interference for all ion pairs at once
+        hit_nums, hit_rates = self.interference_calc.process_combinations_batch(
+            candidate_df, bucket_low, bucket_medium, bucket_high, coverage_all
+        )
         
         # Calculate intensity sum (two channels combined)
-        candidate_df['intensity_sum'] = candidate_df['intensity1'] + candidate_df['intensity2']
+        intensity_sum = candidate_df['intensity1'].to_numpy() + candidate_df['intensity2'].to_numpy()
         
-        # Calculate Sensitivity Score and Specificity Score
-        max_intensity_sum = candidate_df['intensity_sum'].max()
-        max_hit_num = candidate_df['hit_num'].max()
+        # Calculate Sensitivity Score and Specificity Score on NumPy arrays
+        max_intensity_sum = np.nanmax(intensity_sum)
+        max_hit_num = hit_nums.max()
         
         # Sensitivity Score = current intensity_sum / maximum intensity_sum among all combinations
         if max_intensity_sum > 0:
-            candidate_df['sensitivity_score'] = candidate_df['intensity_sum'] / max_intensity_sum
+            sensitivity_score = intensity_sum / max_intensity_sum
         else:
-            candidate_df['sensitivity_score'] = 0
+            sensitivity_score = 0
         
         # Specificity Score = 1 - hit_num / maximum hit_num among all combinations, if max hit_num is 0, result is 1
         if max_hit_num > 0:
-            candidate_df['specificity_score'] = 1 - candidate_df['hit_num'] / max_hit_num
+            specificity_score = 1 - hit_nums / max_hit_num
         else:
-            candidate_df['specificity_score'] = 1
+            specificity_score = 1
         
         # Score = weighted combination of sensitivity_score and specificity_score
-        candidate_df['score'] = (
-            candidate_df['sensitivity_score'] * self.config.SENSITIVITY_WEIGHT +
-            candidate_df['specificity_score'] * self.config.SPECIFICITY_WEIGHT
+        score = (
+            sensitivity_score * self.config.SENSITIVITY_WEIGHT +
+            specificity_score * self.config.SPECIFICITY_WEIGHT
+        )
+        
+        # Assign all result columns at once
+        candidate_df = candidate_df.assign(
+            hit_num=hit_nums,
+            hit_rate=hit_rates,
+            intensity_sum=intensity_sum,
+            sensitivity_score=sensitivity_score,
+            specificity_score=specificity_score,
+            score=score
         )
         
         return candidate_df
     
     def select_best_pairs(self, candidate_df: pd.DataFrame) -> Tuple[pd.Series, pd.DataFrame]:
         """Select best ion pairs for NIST method"""
-        # Deduplication by MSMS pair
-        candidate_df['MSMS_combined'] = candidate_df.apply(
-            lambda row: tuple(sorted([row['MSMS1'], row['MSMS2']])), axis=1
-        )
-        candidate_df = candidate_df.drop_duplicates(subset='MSMS_combined')
-        candidate_df = candidate_df.drop(columns=['MSMS_combined'])
-        
-        # Get best combination
-        max_row = candidate_df.loc[candidate_df["score"].idxmax()]
-        max10_rows = candidate_df.nlargest(10, 'score')
-        max10_rows = max10_rows.reset_index(drop=True)
+        # Deduplication by unordered MSMS pair (smaller m/z, larger m/z)
+        msms_low, msms_high = _ordered_msms_pair(candidate_df)
+        duplicated = pd.DataFrame({'low': msms_low, 'high': msms_high}).duplicated().to_numpy()
+        candidate_df = candidate_df[~duplicated]
+        
+        # Get top 10 best combinations, the first one is the best
+        top_positions = _top_k_positions(candidate_df['score'].to_numpy(dtype=np.float64), 10)
+        max_row = candidate_df.iloc[top_positions[0]]
+        max10_rows = candidate_df.iloc[top_positions].reset_index(drop=True)
         
         return max_row, max10_rows
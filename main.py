@@ -68,7 +68,7 @@ def main():
                 logger.info(f"Custom interference database information:")
                 logger.info(f"  Type: {db_info['type']}")
                 logger.info(f"  File count: {db_info['file_count']}")
-                logger.info(f"  Total rows (sampled): {db_info['total_rows']}")
+                logger.info(f"  Total rows: {db_info['total_rows']}")
             
             config.CUSTOM_INTF_DB_PATH = custom_db_path
             config.INTF_TQDB_PATH = custom_db_path
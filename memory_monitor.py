@@ -5,29 +5,89 @@
 Memory monitoring module for MRM Transition Optimization Tool
 """
 
+import os
+import sys
 import tracemalloc
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 import logging
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 logger = logging.getLogger(__name__)
 
 
+def _current_rss_bytes(pid: str = 'self') -> Optional[int]:
+    """Get current resident set size of a process from /proc (Linux), None if unavailable"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
 class MemoryMonitor:
-    """Memory usage monitor"""
+    """Memory usage monitor covering this process and its worker processes"""
     
     def __init__(self):
         self.max_memory_mb = 0
         self.memory_snapshots = []
-        tracemalloc.start()
+        self._observed_peak = 0  # Highest current usage seen, in bytes
+        self.worker_pids = []  # Worker processes whose memory is added to this process's
+        # Process RSS is read from the OS, tracemalloc (which slows down every
+        # allocation) is only used where resource usage is unavailable
+        if resource is None:
+            tracemalloc.start()
     
     def get_memory_mb(self) -> float:
-        """Get current memory usage in MB"""
-        current, peak = tracemalloc.get_traced_memory()
+        """Get peak memory usage in MB"""
+        current, peak = self._get_memory_bytes()
         return peak / (1024 * 1024)  # Convert to MB
     
+    def get_current_memory_mb(self, include_workers: bool = True) -> float:
+        """Get current memory usage in MB, of this process only if include_workers is False"""
+        if not include_workers:
+            current = _current_rss_bytes()
+            if current is not None:
+                return current / (1024 * 1024)
+        current, peak = self._get_memory_bytes()
+        return current / (1024 * 1024)
+    
+    def _get_memory_bytes(self) -> Tuple[int, int]:
+        """
+        Get (current, peak) memory usage in bytes of this process plus its worker processes
+        
+        Pages shared copy-on-write with forked workers are counted once per process,
+        so the totals are an upper bound.
+        """
+        if resource is None:
+            return tracemalloc.get_traced_memory()
+        
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS; for children it is
+        # the peak of the largest finished child process
+        peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss +
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        if sys.platform != 'darwin':
+            peak *= 1024
+        
+        # Current RSS is only available from /proc (Linux), otherwise report the peak
+        current = _current_rss_bytes()
+        if current is None:
+            return peak, peak
+        for pid in self.worker_pids:
+            current += _current_rss_bytes(str(pid)) or 0
+        self._observed_peak = max(self._observed_peak, current)
+        return current, max(peak, self._observed_peak)
+    
+    def set_worker_pids(self, pids: List[int]):
+        """Set the worker processes whose memory usage is included in the reported usage"""
+        self.worker_pids = list(pids)
+    
     def snapshot(self, label: str = ""):
         """Take a memory snapshot"""
-        current, peak = tracemalloc.get_traced_memory()
+        current, peak = self._get_memory_bytes()
         current_mb = current / (1024 * 1024)
         peak_mb = peak / (1024 * 1024)
         
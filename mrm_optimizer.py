@@ -5,9 +5,15 @@
 Main MRM optimizer module for MRM Transition Optimization Tool
 """
 
+import os
 import pandas as pd
+import numpy as np
 import gc
-from typing import Dict, List, Optional
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
 from tqdm import tqdm
 import logging
 
@@ -16,9 +22,80 @@ from data_loader import DataLoader, LazyFileLoader
 from interference_calculator import InterferenceCalculatorQE, InterferenceCalculatorNIST
 from ion_optimizer import IonPairOptimizerQE, IonPairOptimizerNIST
 from memory_monitor import MemoryMonitor
+from ranges import CE_BOUNDS, NCE_BOUNDS, energy_range_codes
 
 logger = logging.getLogger(__name__)
 
+# Optimizer inherited by forked compound worker processes
+_worker_optimizer = None
+
+# Compounds queued per worker process ahead of the result being collected
+_WORKER_QUEUE_DEPTH = 2
+
+
+def _process_compound_safely(optimizer: 'MRMOptimizer', inchikey: str) -> Tuple[Optional[Dict], Optional[Exception]]:
+    """Process a compound, returning (result, error) instead of raising"""
+    try:
+        return optimizer.process_compound(inchikey), None
+    except Exception as e:
+        return None, e
+
+
+def _process_compound_in_worker(inchikey: str) -> Tuple[Optional[Dict], Optional[Exception]]:
+    """Process a compound in a forked worker process"""
+    return _process_compound_safely(_worker_optimizer, inchikey)
+
+
+def _fork_executor(n_workers: int) -> ProcessPoolExecutor:
+    """Create a fork-context process pool and fork all its workers right away"""
+    # Forking while another thread holds a lock can deadlock the child, so stop
+    # tqdm's monitor thread first (the next progress bar update restarts it)
+    if tqdm.monitor is not None:
+        tqdm.monitor.exit()
+    executor = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('fork'))
+    # A fork-context pool starts all of its workers on the first submit
+    executor.submit(int).result()
+    return executor
+
+
+class _FrameLRUCache:
+    """LRU cache of DataFrames bounded by number of entries and by total memory"""
+    
+    def __init__(self, max_items: int, max_mb: float):
+        self.max_items = max_items
+        self.max_bytes = max_mb * 1024 * 1024
+        self.nbytes = 0
+        self._entries = OrderedDict()  # key -> (frame, memory in bytes)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key) -> Optional[pd.DataFrame]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+    
+    def put(self, key, frame: pd.DataFrame):
+        if self.max_items <= 0:
+            return
+        frame_bytes = int(frame.memory_usage(index=True, deep=True).sum())
+        if frame_bytes > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.nbytes -= previous[1]
+        self._entries[key] = (frame, frame_bytes)
+        self.nbytes += frame_bytes
+        while len(self._entries) > self.max_items or self.nbytes > self.max_bytes:
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self.nbytes -= evicted_bytes
+    
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
 
 class MRMOptimizer:
     """Main optimizer class"""
@@ -48,6 +125,14 @@ class MRMOptimizer:
         self.intf_df = None    # Will not be loaded in lazy mode
         self.matched_df = None
         self.unique_inchikeys = None  # Cache unique InChIKeys from demo_data
+        self._inchikey_set = frozenset()  # Hash lookup over unique_inchikeys
+        
+        # LRU cache, bounded in every process by entry count and INTERFERENCE_CACHE_MB, of
+        # interference window queries: (m/z, RT, m/z tolerance, QE format) -> rows
+        self._interference_cache = _FrameLRUCache(self.config.INTERFERENCE_CACHE_SIZE, self.config.INTERFERENCE_CACHE_MB)
+        # Number of results already appended to the intermediate results file, and its columns
+        self._intermediate_saved = 0
+        self._intermediate_columns = None
     
     def load_all_data(self):
         """Load all data - using lazy loading to reduce memory"""
@@ -55,14 +140,17 @@ class MRMOptimizer:
         
         # In single compound mode, we don't need demo_data
         if not self.config.SINGLE_COMPOUND_MODE:
-            self.demo_df = self.data_loader.load_demo_data()
+            # Only InChIKeys are used from demo_data
+            self.demo_df = self.data_loader.load_demo_data(usecols=['InChIKey'])
             self.unique_inchikeys = self.demo_df['InChIKey'].unique().tolist()
+            self._inchikey_set = frozenset(self.unique_inchikeys)
             self.memory_monitor.log_snapshot("Demo data loaded")
             logger.info(f"Found {len(self.unique_inchikeys)} unique InChIKeys")
         else:
             # Still load demo_data but we won't use it for matching
             self.demo_df = None
             self.unique_inchikeys = None
+            self._inchikey_set = frozenset()
         
         # Don't load large files - will query on-demand
         self.pesudo_df = None
@@ -75,23 +163,139 @@ class MRMOptimizer:
     def check_inchikey_exists(self, target_inchikey: str) -> bool:
         """Check if a specific InChIKey exists"""
         # Check in demo_data first (if available)
-        if self.demo_df is not None and target_inchikey in self.demo_df['InChIKey'].values:
+        if target_inchikey in self._inchikey_set:
             return True
         
-        # Query on-demand from Pesudo-TQDB
-        test_df = self.lazy_loader.query_by_inchikey(
+        # Look up the persistent Pesudo-TQDB InChIKey index, without reading any rows
+        return self.lazy_loader.contains_inchikey(
             self.config.PESUDO_TQDB_PATH, target_inchikey, "Pesudo-TQDB"
         )
-        return len(test_df) > 0
     
     def _save_intermediate_results(self, results: List[Dict], processed_count: int):
-        """Save intermediate results"""
-        if results:
+        """Append results produced since the last save to the intermediate results file"""
+        new_results = results[self._intermediate_saved:]
+        if new_results:
             method_suffix = "nist" if self.config.USE_NIST_METHOD else "qe"
-            intermediate_path = f"MRM_optimization_intermediate_{method_suffix}_{processed_count}.csv"
-            result_df = pd.DataFrame(results)
-            result_df.to_csv(intermediate_path, index=False, encoding='utf-8')
-            logger.info(f"Intermediate results saved to {intermediate_path}")
+            intermediate_path = f"MRM_optimization_intermediate_{method_suffix}.csv"
+            result_df = pd.DataFrame(new_results)
+            rewrite = self._intermediate_saved == 0 or not set(result_df.columns) <= set(self._intermediate_columns)
+            if rewrite:
+                # First save of the run, or new columns appeared (e.g. the earlier results
+                # were all "no combination" rows): rewrite the whole file with the new header
+                result_df = pd.DataFrame(results)
+            else:
+                result_df = result_df.reindex(columns=self._intermediate_columns)
+            self._intermediate_columns = list(result_df.columns)
+            with open(intermediate_path, 'w' if rewrite else 'a', encoding='utf-8', newline='') as f:
+                result_df.to_csv(f, index=False, header=rewrite)
+            self._intermediate_saved = len(results)
+            logger.info(f"Intermediate results saved to {intermediate_path} ({processed_count} compounds processed)")
+    
+    def query_interference(self, precursormz: float, rt: float, mz_tolerance: float,
+                           use_avg_mz: bool) -> pd.DataFrame:
+        """Query interference rows around a precursor, reusing results of nearby windows when INTERFERENCE_CACHE_GRID is set"""
+        grid = self.config.INTERFERENCE_CACHE_GRID
+        if grid <= 0:
+            # Exact windows of distinct compounds practically never repeat, caching them only costs memory
+            return self._query_interference_window(precursormz, rt, mz_tolerance, use_avg_mz)
+        precursormz = round(precursormz / grid) * grid
+        rt = round(rt / grid) * grid
+        
+        cache_key = (precursormz, rt, mz_tolerance, use_avg_mz)
+        rows = self._interference_cache.get(cache_key)
+        if rows is not None:
+            return rows
+        
+        rows = self._query_interference_window(precursormz, rt, mz_tolerance, use_avg_mz)
+        self._interference_cache.put(cache_key, rows)
+        return rows
+    
+    def _query_interference_window(self, precursormz: float, rt: float, mz_tolerance: float,
+                                   use_avg_mz: bool) -> pd.DataFrame:
+        """Query interference rows within mz_tolerance and RT_TOLERANCE of a precursor"""
+        return self.lazy_loader.query_interference_by_range(
+            self.config.INTF_TQDB_PATH, precursormz, rt, mz_tolerance, self.config.RT_TOLERANCE,
+            use_avg_mz=use_avg_mz, desc="Interference Database"
+        )
+    
+    def process_compound(self, inchikey: str) -> Optional[Dict]:
+        """Process a single compound using the selected method"""
+        if self.config.USE_NIST_METHOD:
+            return self.process_compound_nist(inchikey)
+        return self.process_compound_qe(inchikey)
+    
+    def _iter_compound_results(self, compounds: List[str]) -> Iterator[Tuple[str, Optional[Dict], Optional[Exception]]]:
+        """Get an iterator of (inchikey, result, error) for every compound in order, using worker processes when configured"""
+        global _worker_optimizer
+        n_workers = min(len(compounds), self.config.N_WORKERS or os.cpu_count() or 1)
+        if n_workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return ((inchikey, *_process_compound_safely(self, inchikey)) for inchikey in compounds)
+        
+        # Build the InChIKey index and range statistics here, so the forked workers
+        # inherit them instead of each building (and writing) them again
+        try:
+            self.lazy_loader.prepare_queries(self.config.PESUDO_TQDB_PATH, self.config.INTF_TQDB_PATH,
+                                             use_avg_mz=not self.config.USE_NIST_METHOD)
+        except Exception as e:
+            logger.warning(f"Error preparing database lookups before starting workers: {e}")
+        
+        # Fork the workers now, before the caller starts its progress bar
+        _worker_optimizer = self
+        executor = _fork_executor(n_workers)
+        self.memory_monitor.set_worker_pids([process.pid for process in multiprocessing.active_children()])
+        return self._iter_worker_results(compounds, n_workers, executor)
+    
+    def _iter_worker_results(self, compounds: List[str], n_workers: int,
+                             executor: ProcessPoolExecutor) -> Iterator[Tuple[str, Optional[Dict], Optional[Exception]]]:
+        """Yield (inchikey, result, error) for every compound in order, processed by worker processes"""
+        global _worker_optimizer
+        pending = deque()  # (inchikey, future) in input order
+        next_index = 0
+        try:
+            while pending or next_index < len(compounds):
+                while next_index < len(compounds) and len(pending) < n_workers * _WORKER_QUEUE_DEPTH:
+                    inchikey = compounds[next_index]
+                    pending.append((inchikey, executor.submit(_process_compound_in_worker, inchikey)))
+                    next_index += 1
+                
+                inchikey, future = pending[0]
+                error = future.exception()
+                if not isinstance(error, BrokenProcessPool):
+                    pending.popleft()
+                    yield (inchikey, *self._collect_or_rerun(inchikey, future))
+                    continue
+                
+                # A worker died (e.g. killed for using too much memory) while processing one of the pending
+                # compounds. Rerun them one at a time in a new process each, never in this process, so the
+                # compound that kills its worker again is reported as failed
+                logger.error(f"A worker process terminated abruptly ({error}), "
+                             f"rerunning the {len(pending)} pending compounds one at a time")
+                executor.shutdown(wait=True)
+                self.memory_monitor.set_worker_pids([])
+                while pending:
+                    inchikey, future = pending.popleft()
+                    yield (inchikey, *self._collect_or_rerun(inchikey, future))
+                if next_index < len(compounds):
+                    executor = _fork_executor(n_workers)
+                    self.memory_monitor.set_worker_pids([process.pid for process in multiprocessing.active_children()])
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.memory_monitor.set_worker_pids([])
+            _worker_optimizer = None
+    
+    @staticmethod
+    def _collect_or_rerun(inchikey: str, future) -> Tuple[Optional[Dict], Optional[Exception]]:
+        """Get the (result, error) of a finished worker future, rerunning the compound alone if its worker died"""
+        error = future.exception()
+        if error is None:
+            return future.result()
+        if not isinstance(error, BrokenProcessPool):
+            return None, error
+        try:
+            with _fork_executor(1) as executor:
+                return executor.submit(_process_compound_in_worker, inchikey).result()
+        except BrokenProcessPool:
+            return None, RuntimeError("worker process terminated abruptly while processing this compound")
     
     def process_compound_nist(self, inchikey: str) -> Optional[Dict]:
         """Process a single compound using NIST method"""
@@ -106,23 +310,23 @@ class MRMOptimizer:
             logger.warning(f"  No data found for InChIKey, skipping")
             return None
         
-        # Keep only [M+H]+ type data
-        working_group_inchikey = working_group_inchikey[working_group_inchikey['Precursor_type'] == '[M+H]+']
+        # Keep only [M+H]+ type data, the rows are selected once together with the fragment ion filter
+        is_mh = working_group_inchikey['Precursor_type'].to_numpy() == '[M+H]+'
         
-        if len(working_group_inchikey) == 0:
+        if not is_mh.any():
             logger.warning(f"  No [M+H]+ type data found, skipping")
             return None
         
-        # Get basic information
-        first_row = working_group_inchikey.iloc[0]
-        precursormz = first_row['PrecursorMZ']
-        rt = first_row['RT']  # Use RT
-        ion_mode = first_row['Ion_mode']
+        # Get basic information from the first [M+H]+ row
+        first = int(np.argmax(is_mh))
+        precursormz = working_group_inchikey['PrecursorMZ'].iat[first]
+        rt = working_group_inchikey['RT'].iat[first]  # Use RT
+        ion_mode = working_group_inchikey['Ion_mode'].iat[first]
         # In single compound mode, use 'Name' from pesudo_df if 'Name_x' doesn't exist
-        if 'Name_x' in first_row and pd.notna(first_row['Name_x']):
-            chemical = first_row['Name_x']
-        elif 'Name' in first_row:
-            chemical = first_row['Name']
+        if 'Name_x' in working_group_inchikey.columns and pd.notna(working_group_inchikey['Name_x'].iat[first]):
+            chemical = working_group_inchikey['Name_x'].iat[first]
+        elif 'Name' in working_group_inchikey.columns:
+            chemical = working_group_inchikey['Name'].iat[first]
         else:
             chemical = inchikey  # Fallback to InChIKey if no name available
         
@@ -132,7 +336,7 @@ class MRMOptimizer:
         
         # Filter fragment ions
         working_group_inchikey = working_group_inchikey[
-            abs(working_group_inchikey['MSMS'] - precursormz) > self.config.PRECURSOR_MZ_MIN_DIFF
+            is_mh & (np.abs(working_group_inchikey['MSMS'].to_numpy(dtype=np.float64) - precursormz) > self.config.PRECURSOR_MZ_MIN_DIFF)
         ]
         
         if len(working_group_inchikey) < 2:
@@ -165,10 +369,7 @@ class MRMOptimizer:
             }
         
         # Prepare interference data - query on-demand
-        different_inchikey_rows = self.lazy_loader.query_interference_by_range(
-            self.config.INTF_TQDB_PATH, precursormz, rt, 0.7, self.config.RT_TOLERANCE,
-            use_avg_mz=False, desc="Interference Database"
-        )
+        different_inchikey_rows = self.query_interference(precursormz, rt, 0.7, use_avg_mz=False)
         
         # Filter by ion_mode
         if len(different_inchikey_rows) > 0 and 'Ion_mode' in different_inchikey_rows.columns:
@@ -176,16 +377,18 @@ class MRMOptimizer:
                 different_inchikey_rows['Ion_mode'] == ion_mode
             ]
         
-        different_inchikey_rows_low = different_inchikey_rows[different_inchikey_rows['NCE'] <= 60.0]
-        different_inchikey_rows_medium = different_inchikey_rows[
-            (different_inchikey_rows['NCE'] <= 120.0) & (different_inchikey_rows['NCE'] > 60.0)
+        if 'NCE' not in different_inchikey_rows.columns:
+            different_inchikey_rows = pd.DataFrame(columns=['InChIKey', 'NCE', 'MSMS'])
+        
+        # Classify rows by NCE range once, then split and count distinct InChIKeys per range in one pass
+        nce_idx = energy_range_codes(different_inchikey_rows['NCE'], NCE_BOUNDS)
+        different_inchikey_rows_low, different_inchikey_rows_medium, different_inchikey_rows_high = [
+            different_inchikey_rows[nce_idx == b] for b in range(3)
         ]
-        different_inchikey_rows_high = different_inchikey_rows[different_inchikey_rows['NCE'] > 120.0]
         
-        coverage_low = len(different_inchikey_rows_low["InChIKey"].unique())
-        coverage_medium = len(different_inchikey_rows_medium["InChIKey"].unique())
-        coverage_high = len(different_inchikey_rows_high["InChIKey"].unique())
-        coverage_all = len(different_inchikey_rows["InChIKey"].unique())
+        coverage_by_range = different_inchikey_rows['InChIKey'].groupby(nce_idx).nunique(dropna=False)
+        coverage_low, coverage_medium, coverage_high = [int(coverage_by_range.get(b, 0)) for b in range(3)]
+        coverage_all = different_inchikey_rows['InChIKey'].nunique(dropna=False)
         
         logger.info(f"  Interference coverage - Low NCE: {coverage_low}, Medium NCE: {coverage_medium}, High NCE: {coverage_high}, Total: {coverage_all}")
         
@@ -199,16 +402,19 @@ class MRMOptimizer:
         max_row, max10_rows = self.ion_optimizer.select_best_pairs(candidate_df)
         
         # Calculate QQQ collision energy
+        slope, intercept = self.config.CE_SLOPE, self.config.CE_INTERCEPT
         if pd.notna(max_row['CE1']) and pd.notna(max_row['CE2']):
-            CE1 = self.config.CE_SLOPE * float(max_row['CE1']) + self.config.CE_INTERCEPT
-            CE2 = self.config.CE_SLOPE * float(max_row['CE2']) + self.config.CE_INTERCEPT
+            CE1 = slope * float(max_row['CE1']) + intercept
+            CE2 = slope * float(max_row['CE2']) + intercept
         else:
             CE1 = 0
             CE2 = 0
         
         # Add QQQ collision energy to max10_rows
-        max10_rows['CE_QQQ1'] = self.config.CE_SLOPE * max10_rows['CE1'] + self.config.CE_INTERCEPT
-        max10_rows['CE_QQQ2'] = self.config.CE_SLOPE * max10_rows['CE2'] + self.config.CE_INTERCEPT
+        max10_rows = max10_rows.assign(
+            CE_QQQ1=slope * max10_rows['CE1'].to_numpy() + intercept,
+            CE_QQQ2=slope * max10_rows['CE2'].to_numpy() + intercept
+        )
         
         logger.info(f"  Best ion pair: {max_row['MSMS1']:.1f} (CE: {CE1:.1f}) / {max_row['MSMS2']:.1f} (CE: {CE2:.1f})")
         logger.info(f"  Max score: {max_row['score']:.4f}")
@@ -249,22 +455,22 @@ class MRMOptimizer:
             logger.warning(f"  No data found for InChIKey, skipping")
             return None
         
-        # Keep only [M+H]+ type data
-        working_group = working_group[working_group['Precursor_type'] == '[M+H]+']
+        # Keep only [M+H]+ type data, the rows are selected once together with the fragment ion filter
+        is_mh = working_group['Precursor_type'].to_numpy() == '[M+H]+'
         
-        if len(working_group) == 0:
+        if not is_mh.any():
             logger.warning(f"  No [M+H]+ type data found, skipping")
             return None
         
-        # Get basic information
-        first_row = working_group.iloc[0]
-        precursormz = first_row['PrecursorMZ']
-        rt = first_row['RT'] + self.config.RT_OFFSET
+        # Get basic information from the first [M+H]+ row
+        first = int(np.argmax(is_mh))
+        precursormz = working_group['PrecursorMZ'].iat[first]
+        rt = working_group['RT'].iat[first] + self.config.RT_OFFSET
         # In single compound mode, use 'Name' from pesudo_df if 'Name_x' doesn't exist
-        if 'Name_x' in first_row and pd.notna(first_row['Name_x']):
-            chemical = first_row['Name_x']
-        elif 'Name' in first_row:
-            chemical = first_row['Name']
+        if 'Name_x' in working_group.columns and pd.notna(working_group['Name_x'].iat[first]):
+            chemical = working_group['Name_x'].iat[first]
+        elif 'Name' in working_group.columns:
+            chemical = working_group['Name'].iat[first]
         else:
             chemical = inchikey  # Fallback to InChIKey if no name available
         
@@ -274,7 +480,7 @@ class MRMOptimizer:
         
         # Filter fragment ions
         working_group = working_group[
-            abs(working_group['MSMS'] - precursormz) > self.config.PRECURSOR_MZ_MIN_DIFF
+            is_mh & (np.abs(working_group['MSMS'].to_numpy(dtype=np.float64) - precursormz) > self.config.PRECURSOR_MZ_MIN_DIFF)
         ]
         
         if len(working_group) < 2:
@@ -302,13 +508,11 @@ class MRMOptimizer:
         
         # Calculate coverage
         coverage = {
-            'low': len(interference_data['low']['Alignment ID'].unique()) if len(interference_data['low']) > 0 else 0,
-            'medium': len(interference_data['medium']['Alignment ID'].unique()) if len(interference_data['medium']) > 0 else 0,
-            'high': len(interference_data['high']['Alignment ID'].unique()) if len(interference_data['high']) > 0 else 0,
-            'all': len(interference_data['low']['Alignment ID'].unique()) + 
-                   len(interference_data['medium']['Alignment ID'].unique()) + 
-                   len(interference_data['high']['Alignment ID'].unique())
+            ce_level: interference_data[ce_level]['Alignment ID'].nunique(dropna=False)
+            if len(interference_data[ce_level]) > 0 else 0
+            for ce_level in ['low', 'medium', 'high']
         }
+        coverage['all'] = coverage['low'] + coverage['medium'] + coverage['high']
         
         logger.info(f"  Interference coverage - Low CE: {coverage['low']}, Medium CE: {coverage['medium']}, High CE: {coverage['high']}, Total: {coverage['all']}")
         
@@ -319,12 +523,15 @@ class MRMOptimizer:
         max_row, max5_rows = self.ion_optimizer.select_best_pairs(candidate_df)
         
         # Calculate QQQ collision energy
-        CE1 = self.config.CE_SLOPE * float(max_row['CE1']) + self.config.CE_INTERCEPT
-        CE2 = self.config.CE_SLOPE * float(max_row['CE2']) + self.config.CE_INTERCEPT
+        slope, intercept = self.config.CE_SLOPE, self.config.CE_INTERCEPT
+        CE1 = slope * float(max_row['CE1']) + intercept
+        CE2 = slope * float(max_row['CE2']) + intercept
         
         # Add QQQ collision energy to max5_rows
-        max5_rows['CE_QQQ1'] = self.config.CE_SLOPE * max5_rows['CE1'] + self.config.CE_INTERCEPT
-        max5_rows['CE_QQQ2'] = self.config.CE_SLOPE * max5_rows['CE2'] + self.config.CE_INTERCEPT
+        max5_rows = max5_rows.assign(
+            CE_QQQ1=slope * max5_rows['CE1'].to_numpy() + intercept,
+            CE_QQQ2=slope * max5_rows['CE2'].to_numpy() + intercept
+        )
         
         logger.info(f"  Best ion pair: {max_row['MSMS1']:.1f} (CE: {CE1:.1f}) / {max_row['MSMS2']:.1f} (CE: {CE2:.1f})")
         logger.info(f"  Max score: {max_row['score']:.4f}")
@@ -351,21 +558,14 @@ class MRMOptimizer:
     def prepare_interference_data_qe(self, precursormz: float, rt: float) -> Dict[str, pd.DataFrame]:
         """Prepare interference data (QE method) - query on-demand"""
         # Query interference data on-demand
-        rt_filtered_rows = self.lazy_loader.query_interference_by_range(
-            self.config.INTF_TQDB_PATH, precursormz, rt,
-            self.config.MZ_TOLERANCE, self.config.RT_TOLERANCE,
-            use_avg_mz=True, desc="Interference Database"
-        )
+        rt_filtered_rows = self.query_interference(precursormz, rt, self.config.MZ_TOLERANCE, use_avg_mz=True)
         
-        # Group by CE
+        # Group by CE, classifying each row once (scoring does not modify the groups, no copies needed)
         if len(rt_filtered_rows) > 0 and 'CE' in rt_filtered_rows.columns:
+            ce_idx = energy_range_codes(rt_filtered_rows['CE'], CE_BOUNDS)
             interference_data = {
-                'low': rt_filtered_rows[rt_filtered_rows['CE'] <= 20.0].copy(),
-                'medium': rt_filtered_rows[
-                    (rt_filtered_rows['CE'] > 20.0) & 
-                    (rt_filtered_rows['CE'] <= 40.0)
-                ].copy(),
-                'high': rt_filtered_rows[rt_filtered_rows['CE'] > 40.0].copy()
+                ce_level: rt_filtered_rows[ce_idx == b]
+                for b, ce_level in enumerate(['low', 'medium', 'high'])
             }
         else:
             interference_data = {
@@ -442,14 +642,20 @@ class MRMOptimizer:
         processed_count = 0
         error_count = 0
         start_time = pd.Timestamp.now()
+        self._intermediate_saved = 0
+        self._intermediate_columns = None
         
-        for i, inchikey in enumerate(tqdm(compounds_to_process, desc='Processing compounds')):
+        # Compounds are independent, results arrive in input order
+        compound_results = self._iter_compound_results(compounds_to_process)
+        
+        # Refresh the progress bar sparingly, and not at all on non-TTY output where the
+        # SAVE_INTERVAL progress report already logs the ETA (disable=None)
+        progress = tqdm(compound_results, total=len(compounds_to_process), desc='Processing compounds', mininterval=5.0,
+                        miniters=max(1, len(compounds_to_process) // 200), smoothing=0.3, disable=None)
+        for i, (inchikey, result, error) in enumerate(progress):
             try:
-                # Select processing function based on method
-                if self.config.USE_NIST_METHOD:
-                    result = self.process_compound_nist(inchikey)
-                else:
-                    result = self.process_compound_qe(inchikey)
+                if error is not None:
+                    raise error
                 
                 if result:
                     results.append(result)
@@ -480,6 +686,10 @@ class MRMOptimizer:
                 
                 # Periodic memory cleanup
                 if (i + 1) % self.config.BATCH_SIZE == 0:
+                    # Compare the current (not peak) resident memory of this process, whose caches are
+                    # the ones cleared; worker processes keep their own caches within INTERFERENCE_CACHE_MB
+                    if self.memory_monitor.get_current_memory_mb(include_workers=False) > 0.8 * self.config.MEMORY_LIMIT_GB * 1024:
+                        self._interference_cache.clear()
                     gc.collect()
                     self.memory_monitor.log_snapshot("After memory cleanup")
                     
@@ -511,7 +721,7 @@ class MRMOptimizer:
             logger.info("\nResults summary:")
             summary_columns = ['chemical', 'MSMS1', 'MSMS2', 'CE_QQQ1', 'CE_QQQ2', 'max_score', 'max_sensitivity_score', 'max_specificity_score']
             available_columns = [col for col in summary_columns if col in result_df.columns]
-            print(result_df[available_columns].head(10))
+            print(result_df.head(10)[available_columns])
         else:
             logger.warning("No compounds processed successfully")
         
@@ -521,7 +731,7 @@ class MRMOptimizer:
         logger.info("Memory Usage Summary:")
         logger.info("="*60)
         logger.info(f"Maximum memory usage: {summary['max_memory_mb']:.2f} MB ({summary['max_memory_gb']:.3f} GB)")
-        logger.info(f"Exceeds 2GB limit: {'Yes' if summary['max_memory_gb'] > 2.0 else 'No'}")
+        logger.info(f"Exceeds {self.config.MEMORY_LIMIT_GB:g}GB limit: {'Yes' if summary['max_memory_gb'] > self.config.MEMORY_LIMIT_GB else 'No'}")
         logger.info("\nMemory usage at key points:")
         for snapshot in summary['snapshots']:
             logger.info(f"  {snapshot['label']}: Peak={snapshot['peak_mb']:.2f} MB")
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Shared m/z, RT and collision energy range definitions for MRM Transition Optimization Tool
+"""
+
+import numpy as np
+
+# Margin added to range checks and search windows so float rounding never drops a boundary match
+WINDOW_MARGIN = 1e-6
+
+# Inclusive upper bounds of the low and medium collision energy ranges:
+# QE method CE (low <= 20 < medium <= 40 < high), NIST method NCE (low <= 60 < medium <= 120 < high)
+CE_BOUNDS = np.array([20.0, 40.0])
+NCE_BOUNDS = np.array([60.0, 120.0])
+
+
+def energy_range_codes(energies, bounds: np.ndarray, missing: int = -1) -> np.ndarray:
+    """Map collision energies to int8 range codes: 0 = low, 1 = medium, 2 = high, missing for NaN"""
+    values = np.asarray(energies, dtype=np.float64)
+    codes = np.searchsorted(bounds, values, side='left').astype(np.int8)
+    codes[np.isnan(values)] = missing
+    return codes
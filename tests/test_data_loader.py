@@ -0,0 +1,114 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loader
+from config import Config
+from data_loader import LazyFileLoader, _load_chunk, _save_chunk
+
+
+def test_chunk_round_trip(tmp_path):
+    chunk = pd.DataFrame({
+        'PrecursorMZ': [300.1, np.nan, 250.0],
+        'count': np.array([1, 2, 3], dtype=np.int64),
+        'flag': [True, False, True],
+        'InChIKey': pd.Series(['AAAA-BBBB-N', None, 'ç-é'], dtype=object),
+        'Name': pd.Series(['x', 'y', None], dtype='str'),
+        'empty': pd.Series(['', '', ''], dtype=object),
+    }, index=pd.RangeIndex(50000, 50003))
+    path = str(tmp_path / 'chunk.bin')
+
+    _save_chunk(path, chunk)
+
+    pd.testing.assert_frame_equal(_load_chunk(path), chunk)
+
+
+def test_chunk_with_non_range_index_is_not_cached(tmp_path):
+    chunk = pd.DataFrame({'PrecursorMZ': [300.1, 250.0]}, index=[7, 3])
+
+    with pytest.raises(ValueError):
+        _save_chunk(str(tmp_path / 'chunk.bin'), chunk)
+
+
+def test_closing_chunk_iterator_early_removes_unfinished_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pd.DataFrame({'PrecursorMZ': np.arange(120000, dtype=np.float64)}).to_csv(tmp_path / 'a.csv', index=False)
+    loader = LazyFileLoader(Config(N_WORKERS=1))
+
+    chunks = loader._iter_csv_chunks(str(tmp_path / 'a.csv'))
+    next(chunks)
+    assert any(name.endswith('.tmp') for name in os.listdir(loader.data_cache_dir))
+    chunks.close()
+
+    assert os.listdir(loader.data_cache_dir) == []
+
+
+def _write_csv(path, inchikeys):
+    pd.DataFrame({'InChIKey': inchikeys, 'MSMS': np.arange(len(inchikeys), dtype=np.float64)}).to_csv(path, index=False)
+
+
+def test_query_by_inchikey_matches_raw_spellings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    folder = tmp_path / 'db'
+    folder.mkdir()
+    _write_csv(folder / 'a.csv', ['AAAAA-BBBBB-N', ' AAAAA-BBBBB-N ', 'aaaaa-bbbbb-n', 'CCCCC-DDDDD-N'])
+    _write_csv(folder / 'b.csv', ['AAAAA- BBBBB-N', 'CCCCC-DDDDD-N'])
+    _write_csv(folder / 'c.csv', ['aaaaa-BBBBB-N'])
+    loader = LazyFileLoader(Config(N_WORKERS=1))
+
+    def matched(inchikey):
+        rows = loader.query_by_inchikey(str(folder), inchikey)
+        return list(zip(rows['InChIKey'], rows['MSMS'])) if len(rows) else []
+
+    # Only files indexing the resolved spelling are read, matching rows exactly, without whitespace or by case
+    assert matched('AAAAA-BBBBB-N') == [('AAAAA-BBBBB-N', 0), ('AAAAA-BBBBB-N', 1), ('aaaaa-bbbbb-n', 2),
+                                        ('AAAAA- BBBBB-N', 0)]
+    assert matched('aaaaa-bbbbb-n') == [('AAAAA-BBBBB-N', 0), ('AAAAA-BBBBB-N', 1), ('aaaaa-bbbbb-n', 2)]
+    assert matched(' aaaaa-BBBBB-N ') == [('aaaaa-BBBBB-N', 0)]
+    # No exact spelling: the first indexed key that matches ignoring case is used
+    assert matched('AAAAA-BBBBB-n') == matched('AAAAA-BBBBB-N')
+    assert matched('EEEEE-FFFFF-N') == []
+    assert loader.contains_inchikey(str(folder), 'ccccc-ddddd-n')
+
+
+def test_query_interference_by_range_skips_files_and_chunks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    folder = tmp_path / 'intf'
+    folder.mkdir()
+    # Sorted m/z, so each 50000-row chunk covers a narrow m/z range
+    n_rows = 120000
+    near = pd.DataFrame({
+        'InChIKey': [f'K{i % 97}' for i in range(n_rows)],
+        'PrecursorMZ': np.linspace(100.0, 400.0, n_rows),
+        'RT': np.tile([1.0, 5.0, 9.0], n_rows // 3),
+        'MSMS': 50.0,
+    })
+    near.to_csv(folder / 'near.csv', index=False)
+    far = near.assign(PrecursorMZ=near['PrecursorMZ'] + 1000.0)
+    far.to_csv(folder / 'far.csv', index=False)
+    near = pd.read_csv(folder / 'near.csv')
+    expected = near[(abs(near['PrecursorMZ'] - 150.0) <= 0.7) & (abs(near['RT'] - 4.0) <= 2.0)]
+
+    loader = LazyFileLoader(Config(N_WORKERS=1))
+    loaded_chunks = []
+    read_files = []
+    original_iter = LazyFileLoader._iter_csv_chunks
+    original_load = data_loader._load_chunk
+    monkeypatch.setattr(LazyFileLoader, '_iter_csv_chunks',
+                        lambda self, path, *args: read_files.append(os.path.basename(path)) or original_iter(self, path, *args))
+    monkeypatch.setattr(data_loader, '_load_chunk', lambda path: loaded_chunks.append(path) or original_load(path))
+
+    # The first query converts the file to the chunk cache, the second reads it back
+    for _ in range(2):
+        result = loader.query_interference_by_range(str(folder), 150.0, 4.0, 0.7, 2.0)
+        assert result['PrecursorMZ'].tolist() == expected['PrecursorMZ'].tolist()
+        assert result['RT'].tolist() == expected['RT'].tolist()
+
+    # far.csv is outside the m/z range and never read, only the first cached chunk can match
+    assert read_files == ['near.csv', 'near.csv']
+    assert [os.path.basename(path) for path in loaded_chunks] == ['chunk_000000.bin']
@@ -0,0 +1,126 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from interference_calculator import InterferenceCalculatorNIST, InterferenceCalculatorQE
+
+
+def test_process_combination_accepts_interference_rows():
+    calc = InterferenceCalculatorNIST(Config())
+    low = pd.DataFrame({'MSMS': [100.5, 150.0, 101.0], 'InChIKey': ['K1', 'K2', 'K1']})
+    medium = pd.DataFrame({'MSMS': [200.2, 199.0], 'InChIKey': ['K3', 'K4']})
+    high = pd.DataFrame(columns=['MSMS', 'InChIKey'])
+    row = pd.Series({'MSMS1': 100.0, 'intensity1': 1.0, 'NCE1': 40.0, 'CE1': 20.0,
+                     'MSMS2': 200.0, 'intensity2': 0.5, 'NCE2': 80.0, 'CE2': 40.0})
+
+    hit_num, hit_rate = calc.process_combination(0, row, low, medium, high, 2, 2, 0, 4)
+
+    # K1 interferes with the quantifier ion, K3 and K4 with the qualifier ion
+    assert hit_num == 3
+    assert hit_rate == 0.75
+
+
+def test_process_single_ion_counts_distinct_interfering_inchikeys():
+    calc = InterferenceCalculatorNIST(Config())
+    low = pd.DataFrame({'MSMS': [100.5, 150.0, 101.0], 'InChIKey': ['K1', 'K2', 'K1']})
+    medium = pd.DataFrame({'MSMS': [200.2, 199.0], 'InChIKey': ['K3', 'K4']})
+    high = pd.DataFrame(columns=['MSMS', 'InChIKey'])
+
+    assert calc.process_single_ion(pd.Series({'MSMS': 100.0, 'NCE': 40.0}), low, medium, high, 2, 4, 0, 5) == (1, 0.5)
+    assert calc.process_single_ion(pd.Series({'MSMS': 200.0, 'NCE': 80.0}), low, medium, high, 2, 4, 0, 5) == (2, 0.5)
+    assert calc.process_single_ion(pd.Series({'MSMS': 200.0, 'NCE': 150.0}), low, medium, high, 2, 4, 0, 5) == (0, 0)
+    assert calc.process_single_ion(pd.Series({'MSMS': 100.0, 'NCE': float('nan')}), low, medium, high, 2, 4, 0, 5) == (0, 0)
+
+
+def test_process_ce_range_selects_bucket_by_nce():
+    calc = InterferenceCalculatorNIST(Config())
+    buckets = [calc.prepare_bucket(pd.DataFrame({'MSMS': msms, 'InChIKey': keys}))
+               for msms, keys in [([101.0, 100.5, 150.0], ['K1', 'K2', 'K3']), ([99.0], ['K4']), ([], [])]]
+
+    assert sorted(calc.process_ce_range(*buckets, 100.0, 60.0)) == ['K1', 'K2']
+    assert list(calc.process_ce_range(*buckets, 100.0, 60.5)) == ['K4']
+    assert len(calc.process_ce_range(*buckets, 100.0, 121.0)) == 0
+    assert len(calc.process_ce_range(*buckets, 100.0, float('nan'))) == 0
+
+
+def _reference_combination_hits(row, low, medium, high, coverage_all):
+    """Per-combination interference count of the original DataFrame implementation"""
+    def interfering_rows(ion, nce):
+        if nce <= 60.0:
+            rows = low
+        elif nce <= 120.0:
+            rows = medium
+        else:
+            rows = high
+        return rows[abs(ion - rows['MSMS']) <= 1]
+
+    inchikeys = (set(interfering_rows(row['MSMS1'], row['NCE1'])['InChIKey']) |
+                 set(interfering_rows(row['MSMS2'], row['NCE2'])['InChIKey']))
+    return len(inchikeys), len(inchikeys) / coverage_all if coverage_all != 0 else 0
+
+
+def test_process_combinations_batch_matches_per_combination_loop():
+    rng = np.random.default_rng(0)
+    calc = InterferenceCalculatorNIST(Config())
+    # m/z on a 0.5 grid, so many ions sit exactly on the +-1 Da window boundary
+    buckets = [pd.DataFrame({'MSMS': rng.integers(190, 230, size=n) / 2,
+                             'InChIKey': rng.choice(['K1', 'K2', 'K3', 'K4', 'K5'], size=n)})
+               for n in (40, 25, 0)]
+    candidate_df = pd.DataFrame({
+        'MSMS1': rng.integers(190, 230, size=60) / 2,
+        'NCE1': rng.choice([30.0, 60.0, 60.5, 120.0, 150.0], size=60),
+        'MSMS2': rng.integers(190, 230, size=60) / 2,
+        'NCE2': rng.choice([30.0, 60.0, 60.5, 120.0, 150.0], size=60),
+    })
+
+    hit_nums, hit_rates = calc.process_combinations_batch(
+        candidate_df, *(calc.prepare_bucket(rows) for rows in buckets), 7
+    )
+
+    expected = [_reference_combination_hits(row, *buckets, 7) for _, row in candidate_df.iterrows()]
+    assert hit_nums.tolist() == [hit_num for hit_num, _ in expected]
+    assert np.allclose(hit_rates, [hit_rate for _, hit_rate in expected])
+
+
+def _reference_spectrum_intensity(msms_spectrum, target_ion, tolerance):
+    """Per-spectrum intensity sum of the original string parsing implementation"""
+    if pd.isna(msms_spectrum) or msms_spectrum == '':
+        return 0.0
+    total_intensity = 0.0
+    for peak in msms_spectrum.split():
+        if ':' in peak:
+            parts = peak.split(':', 1)
+            try:
+                mz = float(parts[0])
+                intensity = float(parts[1])
+            except (ValueError, IndexError):
+                continue
+            if abs(mz - target_ion) <= tolerance:
+                total_intensity += intensity
+    return total_intensity
+
+
+def test_pooled_peak_sums_match_per_spectrum_sums():
+    config = Config()
+    calc = InterferenceCalculatorQE(config)
+    spectra = pd.Series([
+        '100.0:10 100.7:5 101.5:2',
+        '99.3:1 100.0:10 250.2:7',
+        '100.0:10 100.7:5 101.5:2',  # duplicate spectrum
+        'bad 100.2:x 100.4:3:4 :5 100.1:8',  # malformed peaks are skipped
+        '',
+        np.nan,
+        '250.9:4',
+    ])
+    target_ions = np.array([100.0, 100.7, 250.2, 101.4, 300.0, 100.0])
+
+    sums = calc.sum_intensities(calc.prepare_peaks(spectra), target_ions)
+
+    expected = [sum(_reference_spectrum_intensity(spectrum, ion, config.MSMS_TOLERANCE) for spectrum in spectra)
+                for ion in target_ions]
+    assert np.allclose(sums, expected)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ion_optimizer import _top_k_positions
+
+
+def test_top_k_positions_match_nlargest_with_ties_and_nan():
+    rng = np.random.default_rng(0)
+    for n in (0, 1, 4, 12, 40):
+        # Few distinct values, so most scores are tied
+        scores = rng.integers(0, 4, size=n).astype(np.float64)
+        scores[rng.random(n) < 0.3] = np.nan
+        for k in (1, 5, 10, n + 3):
+            expected = pd.DataFrame({'score': scores}).nlargest(k, 'score').index.tolist()
+            assert _top_k_positions(scores, k).tolist() == expected
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from mrm_optimizer import MRMOptimizer
+
+
+def _no_combination_result(inchikey):
+    return {
+        'chemical': inchikey,
+        'Precursor_mz': 300.0,
+        'InChIKey': inchikey,
+        'RT': 5.0,
+        'coverage_low': 0,
+        'coverage_medium': 0,
+        'coverage_high': 0,
+        'coverage_all': 0,
+        'best5_combinations': "no combination",
+        'max_score': 0,
+    }
+
+
+def _full_result(inchikey):
+    return {
+        'chemical': inchikey,
+        'Precursor_mz': 300.0,
+        'InChIKey': inchikey,
+        'RT': 5.0,
+        'coverage_all': 3,
+        'coverage_low': 1,
+        'coverage_medium': 1,
+        'coverage_high': 1,
+        'MSMS1': 120.1,
+        'MSMS2': 95.0,
+        'CE_QQQ1': 20.0,
+        'CE_QQQ2': 25.0,
+        'best10_combinations': [{'MSMS1': 120.1, 'MSMS2': 95.0}],
+        'max_score': 0.9,
+        'max_sensitivity_score': 0.8,
+        'max_specificity_score': 0.7,
+    }
+
+
+def test_intermediate_results_keep_columns_added_after_first_save(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    optimizer = MRMOptimizer(Config())
+
+    # The first saved batch only has "no combination" results
+    results = [_no_combination_result('A'), _no_combination_result('B')]
+    optimizer._save_intermediate_results(results, 2)
+    results += [_full_result('C'), _full_result('D')]
+    optimizer._save_intermediate_results(results, 4)
+    results += [_no_combination_result('E')]
+    optimizer._save_intermediate_results(results, 5)
+
+    saved = pd.read_csv(tmp_path / 'MRM_optimization_intermediate_nist.csv')
+    expected_columns = list(dict.fromkeys(key for result in results for key in result))
+    assert list(saved.columns) == expected_columns
+    assert saved['InChIKey'].tolist() == ['A', 'B', 'C', 'D', 'E']
+    assert saved['MSMS1'].tolist()[2:4] == [120.1, 120.1]
+    assert saved['max_specificity_score'].tolist()[2:4] == [0.7, 0.7]
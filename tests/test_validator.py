@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validator import InterferenceDBValidator
+
+
+NIST_HEADER = 'InChIKey,PrecursorMZ,RT,MSMS,NCE,CE,Ion_mode,Precursor_type\n'
+NIST_ROW = 'AAAAAAAAAAAAAA-BBBBBBBBBB-N,300.1,5.0,120.1,40,20,P,[M+H]+\n'
+
+
+def test_folder_results_follow_files_edited_in_place(tmp_path):
+    csv_path = tmp_path / 'part1.csv'
+    csv_path.write_text(NIST_HEADER + NIST_ROW)
+    folder_mtime_ns = os.stat(tmp_path).st_mtime_ns
+
+    assert InterferenceDBValidator.validate_interference_db(str(tmp_path), 'nist')[0]
+    assert InterferenceDBValidator.get_db_info(str(tmp_path))['total_rows'] == 1
+
+    # Editing a file in place leaves the folder's own mtime unchanged
+    with open(csv_path, 'w') as f:
+        f.write('InChIKey,PrecursorMZ\n' + 'AAAAAAAAAAAAAA-BBBBBBBBBB-N,300.1\n' * 2)
+    os.utime(tmp_path, ns=(folder_mtime_ns, folder_mtime_ns))
+
+    assert not InterferenceDBValidator.validate_interference_db(str(tmp_path), 'nist')[0]
+    assert InterferenceDBValidator.get_db_info(str(tmp_path))['total_rows'] == 2
+
+
+def test_only_successful_validations_are_reused(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'db.csv'
+    csv_path.write_text(NIST_HEADER + NIST_ROW)
+    results = iter([(False, "Failed to read"), (True, "Validation passed")])
+    monkeypatch.setattr(InterferenceDBValidator, '_validate_existing_db', staticmethod(lambda *args: next(results)))
+
+    # A failure (e.g. the file was still being written) is checked again on the next call
+    assert InterferenceDBValidator.validate_interference_db(str(csv_path), 'nist') == (False, "Failed to read")
+    assert InterferenceDBValidator.validate_interference_db(str(csv_path), 'nist') == (True, "Validation passed")
+    assert InterferenceDBValidator.validate_interference_db(str(csv_path), 'nist') == (True, "Validation passed")
@@ -9,10 +9,67 @@ Validates user-uploaded interference database format
 import os
 import pandas as pd
 import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple
 
+from data_loader import LazyFileLoader
+
 logger = logging.getLogger(__name__)
 
+# Block size for counting line breaks in CSV files
+_COUNT_BLOCK_SIZE = 1 << 20
+
+# Maximum number of threads counting rows of a database folder
+_MAX_COUNT_THREADS = 8
+
+# Maximum number of entries kept in each memoization cache below
+_MAX_CACHED_DBS = 16
+
+# LRU cache of successful validations: (absolute path, signature, method) -> message
+_validation_cache = OrderedDict()
+
+# LRU cache of database information: (absolute path, signature) -> info
+_db_info_cache = OrderedDict()
+
+
+def _cache_get(cache: OrderedDict, key):
+    """Get a value from an LRU cache, None if absent"""
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _cache_put(cache: OrderedDict, key, value):
+    """Add a value to an LRU cache, evicting the least recently used entries"""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > _MAX_CACHED_DBS:
+        cache.popitem(last=False)
+
+
+def _get_db_signature(db_path: str) -> str:
+    """Get signature of a database file, or of the CSV files in a database folder"""
+    if os.path.isdir(db_path):
+        # A folder's own mtime does not change when a file inside it is edited in place
+        return LazyFileLoader._get_folder_signature(db_path)
+    stat = os.stat(db_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _count_csv_rows(file_path: str) -> int:
+    """Count data rows of a CSV file by counting line breaks, without parsing it"""
+    line_count = 0
+    last_block = b''
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_COUNT_BLOCK_SIZE), b''):
+            line_count += block.count(b'\n')
+            last_block = block
+    if last_block and not last_block.endswith(b'\n'):
+        line_count += 1
+    return max(line_count - 1, 0)  # minus header
+
 
 class InterferenceDBValidator:
     """Validator for interference database format"""
@@ -38,6 +95,21 @@ class InterferenceDBValidator:
         if not os.path.exists(db_path):
             return False, f"Interference database path does not exist: {db_path}"
         
+        # Reuse an earlier successful validation of the unchanged path; failures are always
+        # rechecked, so a database fixed while the program runs is accepted
+        cache_key = (os.path.abspath(db_path), _get_db_signature(db_path), method)
+        message = _cache_get(_validation_cache, cache_key)
+        if message is not None:
+            return True, message
+        
+        is_valid, message = InterferenceDBValidator._validate_existing_db(db_path, method)
+        if is_valid:
+            _cache_put(_validation_cache, cache_key, message)
+        return is_valid, message
+    
+    @staticmethod
+    def _validate_existing_db(db_path: str, method: str) -> Tuple[bool, str]:
+        """Validate an existing interference database file or folder"""
         try:
             # Check if it's a file or folder
             if os.path.isfile(db_path):
@@ -45,8 +117,8 @@ class InterferenceDBValidator:
                 if not db_path.endswith('.csv'):
                     return False, f"Interference database file must be in CSV format: {db_path}"
                 
-                # Read first chunk to check columns
-                chunk = pd.read_csv(db_path, nrows=100, encoding='utf-8', low_memory=False)
+                # Read the header only to check columns
+                chunk = pd.read_csv(db_path, nrows=0, encoding='utf-8')
                 required_columns = InterferenceDBValidator.NIST_REQUIRED_COLUMNS if method == 'nist' else InterferenceDBValidator.QE_REQUIRED_COLUMNS
                 
                 missing_columns = [col for col in required_columns if col not in chunk.columns]
@@ -64,7 +136,7 @@ class InterferenceDBValidator:
                 
                 # Check first file as sample
                 sample_file = os.path.join(db_path, csv_files[0])
-                chunk = pd.read_csv(sample_file, nrows=100, encoding='utf-8', low_memory=False)
+                chunk = pd.read_csv(sample_file, nrows=0, encoding='utf-8')
                 required_columns = InterferenceDBValidator.NIST_REQUIRED_COLUMNS if method == 'nist' else InterferenceDBValidator.QE_REQUIRED_COLUMNS
                 
                 missing_columns = [col for col in required_columns if col not in chunk.columns]
@@ -101,24 +173,27 @@ class InterferenceDBValidator:
         if not info['exists']:
             return info
         
+        cache_key = (os.path.abspath(db_path), _get_db_signature(db_path))
+        cached_info = _cache_get(_db_info_cache, cache_key)
+        if cached_info is not None:
+            return dict(cached_info, path=db_path)
+        
         try:
             if os.path.isfile(db_path):
                 info['file_count'] = 1
                 # Count rows (approximate)
-                chunk_count = 0
-                for chunk in pd.read_csv(db_path, chunksize=10000, encoding='utf-8', low_memory=False):
-                    chunk_count += len(chunk)
-                info['total_rows'] = chunk_count
+                info['total_rows'] = _count_csv_rows(db_path)
             else:
                 csv_files = [f for f in os.listdir(db_path) if f.endswith('.csv')]
                 info['file_count'] = len(csv_files)
-                # Count rows from first few files (sample)
-                sample_files = csv_files[:5] if len(csv_files) > 5 else csv_files
-                for csv_file in sample_files:
-                    file_path = os.path.join(db_path, csv_file)
-                    for chunk in pd.read_csv(file_path, chunksize=10000, encoding='utf-8', low_memory=False):
-                        info['total_rows'] += len(chunk)
+                # Counting line breaks is cheap, so count rows of every file, overlapping file reads
+                file_paths = [os.path.join(db_path, csv_file) for csv_file in csv_files]
+                if file_paths:
+                    with ThreadPoolExecutor(max_workers=min(_MAX_COUNT_THREADS, len(file_paths))) as executor:
+                        info['total_rows'] = sum(executor.map(_count_csv_rows, file_paths))
         except Exception as e:
             logger.warning(f"Error getting interference database information: {e}")
+            return info
         
+        _cache_put(_db_info_cache, cache_key, dict(info))
         return info